@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class _Request:
+    __slots__ = ("prompt", "max_new_tokens", "temperature", "enqueued", "done", "result", "error")
+
+    def __init__(self, prompt: str, max_new_tokens: int, temperature: float):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[Exception] = None
+
+
+class GenerationBatcher:
+    """
+    Dynamic micro-batching for model.generate.
+
+    Callers on any thread submit a prompt and block until its answer is ready. A single
+    scheduler thread waits up to `window_ms` after the first pending request (or until
+    `max_batch_size` requests are waiting), left-pads the prompts, runs them through one
+    batched generate call and hands each caller back only its own new tokens. Requests
+    are grouped by temperature, since sampling settings apply to the whole batch.
+    """
+
+    def __init__(self, get_model: Callable[[], Tuple[Any, Any]], window_ms: float = 20, max_batch_size: int = 8):
+        self.get_model = get_model
+        self.window_ms = window_ms
+        self.max_batch_size = max(1, max_batch_size)
+        self._cond = threading.Condition()
+        self._pending: List[_Request] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        # Metrics
+        self._batches = 0
+        self._requests = 0
+        self._batch_sizes: Counter = Counter()
+        self._last_batch_seconds = 0.0
+
+    def submit(self, prompt: str, max_new_tokens: int, temperature: float) -> str:
+        """Queue a prompt for the next batch and wait for its generated text."""
+        request = _Request(prompt, max_new_tokens, temperature)
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Generation batcher is stopped")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="generation-batcher", daemon=True)
+                self._thread.start()
+            self._pending.append(request)
+            self._cond.notify_all()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {
+                "queue_depth": len(self._pending),
+                "batches": self._batches,
+                "requests": self._requests,
+                "avg_batch_size": round(self._requests / self._batches, 2) if self._batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "last_batch_seconds": round(self._last_batch_seconds, 3),
+                "window_ms": self.window_ms,
+                "max_batch_size": self.max_batch_size,
+            }
+
+    def _next_batch(self) -> Optional[List[_Request]]:
+        with self._cond:
+            while not self._pending and not self._stopped:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            # Give other callers until the window closes to join, unless the batch is already full
+            deadline = self._pending[0].enqueued + self.window_ms / 1000
+            while len(self._pending) < self.max_batch_size and not self._stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            temperature = self._pending[0].temperature
+            batch = [r for r in self._pending if r.temperature == temperature][:self.max_batch_size]
+            self._pending = [r for r in self._pending if r not in batch]
+            return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[_Request]) -> None:
+        start_time = time.time()
+        try:
+            model, tokenizer = self.get_model()
+            if model is None or tokenizer is None:
+                raise RuntimeError("No model loaded")
+            # Decoder-only models must be padded on the left so every prompt ends right before its answer
+            tokenizer.padding_side = "left"
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            inputs = tokenizer([r.prompt for r in batch], return_tensors="pt", padding=True).to(model.device)
+            outputs = model.generate(
+                **inputs,
+                max_new_tokens=max(r.max_new_tokens for r in batch),
+                pad_token_id=tokenizer.pad_token_id,
+                do_sample=True,
+                temperature=batch[0].temperature,
+                top_p=0.95,
+            )
+            prompt_length = inputs["input_ids"].shape[1]
+            for request, output in zip(batch, outputs):
+                new_tokens = output[prompt_length:prompt_length + request.max_new_tokens]
+                request.result = tokenizer.decode(new_tokens, skip_special_tokens=True)
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        finally:
+            elapsed = time.time() - start_time
+            with self._cond:
+                self._batches += 1
+                self._requests += len(batch)
+                self._batch_sizes[len(batch)] += 1
+                self._last_batch_seconds = elapsed
+            for request in batch:
+                request.done.set()
@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of note parsing throughput for each storage codec.
+
+Generates synthetic notes, encodes them once per format, then times turning the encoded
+text back into Note objects. Reports notes/sec for the pure-Python YAML parser (how
+notes used to be loaded), libyaml, and JSON, plus JSON built with `model_construct`
+(no validation) for comparison.
+
+Usage:
+    poetry run python benchmark_codecs.py --notes 5000 --runs 3
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+import yaml
+from models import Note
+from note_codec import LIBYAML, JSONCodec, YAMLCodec
+
+WORDS = ("meeting project timeline budget review design release customer feature bug "
+         "roadmap planning research idea draft follow-up decision risk team notes").split()
+
+
+def make_notes(count: int, words: int) -> List[Note]:
+    rng = random.Random(0)
+    start = datetime(2025, 1, 1)
+    return [
+        Note(
+            timestamp=start + timedelta(seconds=i),
+            title=" ".join(rng.choices(WORDS, k=5)).capitalize(),
+            summary=" ".join(rng.choices(WORDS, k=20)),
+            contents=" ".join(rng.choices(WORDS, k=words)),
+            tags=rng.sample(WORDS, 3),
+        )
+        for i in range(count)
+    ]
+
+
+def construct(data: dict) -> Note:
+    """A Note built from trusted data without validation."""
+    return Note.model_construct(**{**data, "timestamp": datetime.fromisoformat(data["timestamp"])})
+
+
+def throughput(texts: List[str], decode: Callable[[str], Note], runs: int) -> float:
+    """Best notes/sec over `runs` passes."""
+    best = float("inf")
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        for text in texts:
+            decode(text)
+        best = min(best, time.perf_counter() - start_time)
+    return len(texts) / best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare note parsing throughput of the storage codecs")
+    parser.add_argument("--notes", type=int, default=2000, help="Number of synthetic notes (default: 2000)")
+    parser.add_argument("--words", type=int, default=200, help="Words of content per note (default: 200)")
+    parser.add_argument("--runs", type=int, default=3, help="Timed passes per codec; the best is reported (default: 3)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    args = parser.parse_args()
+
+    notes = make_notes(args.notes, args.words)
+    yaml_codec, json_codec = YAMLCodec(), JSONCodec()
+    yaml_texts = [yaml_codec.encode(note) for note in notes]
+    json_texts = [json_codec.encode(note) for note in notes]
+
+    cases = [
+        ("yaml (pure Python)", yaml_texts, lambda text: Note(**yaml.safe_load(text))),
+        ("yaml (libyaml)", yaml_texts, yaml_codec.decode),
+        ("json", json_texts, json_codec.decode),
+        # For comparison: skipping validation is not faster with pydantic 2's Rust core
+        ("json.loads + model_construct", json_texts, lambda text: construct(json.loads(text))),
+    ]
+    if not LIBYAML:
+        print("libyaml is not available; the libyaml rows use the pure-Python parser")
+
+    baseline = None
+    if not args.json:
+        print(f"{'codec':<34} {'notes/sec':>10} {'speedup':>8}")
+    for name, texts, decode in cases:
+        rate = throughput(texts, decode, args.runs)
+        baseline = baseline or rate
+        if args.json:
+            print(json.dumps({"codec": name, "notes_per_second": round(rate), "speedup": round(rate / baseline, 2)}))
+        else:
+            print(f"{name:<34} {rate:>10.0f} {rate / baseline:>7.1f}x")
@@ -0,0 +1,55 @@
+import re
+from typing import Callable, List
+
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _pieces(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[tuple]:
+    """Break text into (piece, tokens) no longer than max_tokens: paragraphs, then sentences, then words."""
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = count_tokens(paragraph)
+        if tokens <= max_tokens:
+            pieces.append((paragraph, tokens))
+            continue
+        for sentence in SENTENCE_END_RE.split(paragraph):
+            tokens = count_tokens(sentence)
+            if tokens <= max_tokens:
+                pieces.append((sentence, tokens))
+                continue
+            # A run-on "sentence" (e.g. an unpunctuated transcript) is cut between words
+            words = sentence.split()
+            step = max(1, len(words) * max_tokens // tokens)
+            for start in range(0, len(words), step):
+                piece = " ".join(words[start:start + step])
+                pieces.append((piece, count_tokens(piece)))
+    return pieces
+
+
+def split_text(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """
+    Split text into chunks of at most about `max_tokens` tokens, breaking at paragraph
+    boundaries where possible, then at sentence ends, and only then between words.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for piece, tokens in _pieces(text, max_tokens, count_tokens):
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def truncate_text(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> str:
+    """The beginning of the text, up to about `max_tokens` tokens; short texts are returned unchanged."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    # No token is longer than this many characters in practice, so the rest cannot matter
+    chunks = split_text(text[:max_tokens * 16], max_tokens, count_tokens)
+    return chunks[0] if chunks else ""
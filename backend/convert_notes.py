@@ -0,0 +1,24 @@
+"""
+One-shot conversion of a notes directory between the YAML and JSON file formats.
+
+Usage:
+    poetry run python convert_notes.py --to json [--notes-dir notes]
+
+Afterwards start the backend with NOTES_FORMAT set to the new format. Stop the backend
+before converting.
+"""
+import argparse
+import time
+from note_codec import CODECS
+from storage import convert_note_format
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the note files of a notes directory to another format.")
+    parser.add_argument("--notes-dir", default="notes", help="Notes directory to convert (default: notes)")
+    parser.add_argument("--from", dest="source", choices=list(CODECS), default="yaml", help="Current format (default: yaml)")
+    parser.add_argument("--to", dest="target", choices=list(CODECS), default="json", help="New format (default: json)")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    count = convert_note_format(args.notes_dir, args.source, args.target)
+    print(f"Converted {count} notes in {args.notes_dir} from {args.source} to {args.target} in {time.time() - start_time:.2f}s")
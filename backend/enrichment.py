@@ -0,0 +1,111 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from models import Note
+from storage import NoteStorage
+
+# Values of Note.enrichment_status
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+class EnrichmentQueue:
+    """
+    Background queue that fills in AI-generated metadata for notes saved with fallbacks.
+
+    Notes are persisted straight away with `enrichment_status="pending"` and the fields
+    still to generate in `pending_fields`. Workers pick them up, run the (blocking)
+    generation in a thread so the event loop stays responsive, and rewrite the note.
+    `generate` returns only the fields the model produced; if any are missing the note
+    is marked "failed" with those fields still in `pending_fields`, so they are retried
+    on the next start. `update(note, expected)` saves the result only if the stored note
+    still equals the one enrichment started from, so an edit made while generating is
+    never overwritten; the edit queues its own job.
+
+    Generation runs on the queue's own pool of one thread per worker, and storage calls
+    on `storage_executor`, so neither occupies the default executor that streamed
+    generation waits on for every token.
+    """
+
+    def __init__(self, storage: NoteStorage,
+                 generate: Callable[[str, List[str]], Dict[str, object]],
+                 update: Callable[[Note, Note], bool],
+                 storage_executor: Optional[Executor] = None):
+        self.storage = storage
+        self.generate = generate
+        self.update = update
+        self.storage_executor = storage_executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def depth(self) -> int:
+        """Number of notes waiting to be enriched."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self, workers: int = 1, pending: Optional[List[Note]] = None) -> None:
+        """Start the workers and re-queue notes left pending by a previous run."""
+        self._queue = asyncio.Queue()
+        for note in pending or []:
+            self.submit(note.timestamp)
+        workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="enrichment")
+        self._workers = [asyncio.create_task(self._run()) for _ in range(workers)]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._executor is not None:
+            # A generation already running cannot be interrupted; do not wait for it
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def submit(self, timestamp: datetime) -> None:
+        if self._queue is None:
+            raise RuntimeError("Enrichment queue is not running")
+        self._queue.put_nowait(timestamp)
+
+    async def _run(self) -> None:
+        while True:
+            timestamp = await self._queue.get()
+            try:
+                await self._enrich(timestamp)
+            except Exception as e:
+                print(f"Error enriching note {timestamp}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _enrich(self, timestamp: datetime) -> None:
+        loop = asyncio.get_running_loop()
+        note = await loop.run_in_executor(self.storage_executor, self.storage.get_note, timestamp)
+        if note is None or note.enrichment_status not in (PENDING, FAILED) or not note.pending_fields:
+            return
+
+        start_time = time.time()
+        try:
+            generated = await loop.run_in_executor(self._executor, self.generate, note.contents, note.pending_fields)
+        except Exception as e:
+            print(f"Enrichment failed for note {timestamp}, keeping fallback metadata: {e}")
+            generated = None
+
+        generated = {field: value for field, value in (generated or {}).items() if field in note.pending_fields}
+        try:
+            updated = Note(**{**note.model_dump(), **generated})
+        except ValueError as e:
+            print(f"Discarding invalid metadata for note {timestamp}: {e}")
+            updated, generated = note, {}
+        missing = [field for field in note.pending_fields if field not in generated]
+        if missing:
+            print(f"Keeping fallback metadata for note {timestamp}: {', '.join(missing)} not generated")
+        updated = updated.model_copy(update={"enrichment_status": FAILED if missing else DONE, "pending_fields": missing})
+        # The note may have changed while the model was running
+        if not await loop.run_in_executor(self.storage_executor, self.update, updated, note):
+            print(f"Note {timestamp} changed during enrichment, discarding result")
+            return
+        print(f"Note enrichment {updated.enrichment_status}: {updated.title} ({', '.join(note.pending_fields)}) in {time.time() - start_time:.2f}s")
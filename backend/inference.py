@@ -0,0 +1,263 @@
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Iterator, Optional, Tuple
+import httpx
+from transformers import TextIteratorStreamer
+from batching import GenerationBatcher
+
+
+class InferenceBackend(ABC):
+    """
+    Text generation used by the summary, title and tag generators.
+
+    Every prompt comes in two forms: `instruction`, a chat message for instruction-tuned
+    models, and `plain_prompt`, a completion prompt for base models. Implementations pick
+    whichever suits their model. Calls block, so callers run them off the event loop.
+    """
+
+    @property
+    @abstractmethod
+    def available(self) -> bool:
+        """Whether generation can be attempted; callers use fallbacks otherwise."""
+        pass
+
+    @property
+    @abstractmethod
+    def model_name(self) -> str:
+        """Identifies the model, e.g. for cache keys."""
+        pass
+
+    @abstractmethod
+    def generate(self, instruction: str, plain_prompt: str, max_new_tokens: int, temperature: float) -> str:
+        """Generate an answer and return only the new text."""
+        pass
+
+    @abstractmethod
+    def stream(self, instruction: str, plain_prompt: str, max_new_tokens: int, temperature: float) -> Iterator[str]:
+        """Generate an answer, yielding text chunks as they are produced."""
+        pass
+
+    def count_tokens(self, text: str) -> int:
+        """Tokens in the text; without a tokenizer at hand, about four characters per token."""
+        return len(text) // 4 + 1
+
+    @property
+    def context_tokens(self) -> int:
+        """Length of the model's context window, in tokens."""
+        return 4096
+
+    def metrics(self) -> dict:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class TransformersBackend(InferenceBackend):
+    """
+    In-process generation with a transformers causal LM.
+
+    `get_model` returns the current (model, tokenizer), so a model swapped in by the
+    loader is picked up on the next call. Requests go through a GenerationBatcher and
+    share batched generate calls; streams get a generate call of their own.
+    """
+
+    def __init__(self, get_model: Callable[[], Tuple[Any, Any]], window_ms: float = 20, max_batch_size: int = 8):
+        self.get_model = get_model
+        self.batcher = GenerationBatcher(get_model, window_ms=window_ms, max_batch_size=max_batch_size)
+
+    @property
+    def available(self) -> bool:
+        model, tokenizer = self.get_model()
+        return model is not None and tokenizer is not None
+
+    @property
+    def model_name(self) -> str:
+        model, _ = self.get_model()
+        return model.config._name_or_path if model is not None else ""
+
+    def count_tokens(self, text: str) -> int:
+        _, tokenizer = self.get_model()
+        if tokenizer is None:
+            return super().count_tokens(text)
+        return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    @property
+    def context_tokens(self) -> int:
+        model, _ = self.get_model()
+        return getattr(getattr(model, "config", None), "max_position_embeddings", None) or super().context_tokens
+
+    def build_prompt(self, instruction: str, plain_prompt: str) -> str:
+        """
+        Formats the prompt for the loaded model: a chat message for Mistral instruct models,
+        the plain completion prompt for other models.
+        """
+        model, tokenizer = self.get_model()
+        if "mistral" in model.config._name_or_path.lower():
+            # Mistral instruct models follow a specific prompt format.
+            messages = [{"role": "user", "content": instruction}]
+            return tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        return plain_prompt
+
+    def generate(self, instruction: str, plain_prompt: str, max_new_tokens: int, temperature: float) -> str:
+        prompt = self.build_prompt(instruction, plain_prompt)
+        return self.batcher.submit(prompt, max_new_tokens=max_new_tokens, temperature=temperature).strip()
+
+    def stream(self, instruction: str, plain_prompt: str, max_new_tokens: int, temperature: float) -> Iterator[str]:
+        """Streaming bypasses the batcher: generate runs on its own thread and feeds a TextIteratorStreamer."""
+        model, tokenizer = self.get_model()
+        prompt = self.build_prompt(instruction, plain_prompt)
+        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=120)
+        thread = threading.Thread(
+            target=model.generate,
+            kwargs=dict(
+                **inputs,
+                streamer=streamer,
+                max_new_tokens=max_new_tokens,
+                pad_token_id=tokenizer.eos_token_id,
+                do_sample=True,
+                temperature=temperature,
+                top_p=0.95,
+            ),
+            daemon=True,
+        )
+        thread.start()
+        return iter(streamer)
+
+    def metrics(self) -> dict:
+        return self.batcher.metrics()
+
+    def close(self) -> None:
+        self.batcher.stop()
+
+
+class OpenAICompatibleBackend(InferenceBackend):
+    """
+    Generation on a separate OpenAI-compatible server (llama.cpp server, vLLM, Ollama, ...).
+
+    Prompts are sent as chat messages to `/v1/chat/completions`, so the server applies its
+    model's own chat template. One pooled HTTP client is shared by all callers; the server
+    is expected to batch concurrent requests itself.
+
+    `available` reports the last answer to a cheap `GET /v1/models` probe, repeated at
+    most every `probe_interval` seconds; requests that cannot reach the server mark it
+    unavailable until the next probe.
+    """
+
+    def __init__(self, base_url: str, model: str, api_key: Optional[str] = None,
+                 timeout: float = 60.0, connect_timeout: float = 5.0, max_connections: int = 16,
+                 context_tokens: int = 4096, probe_interval: float = 5.0):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self._context_tokens = context_tokens
+        self.connect_timeout = connect_timeout
+        self.probe_interval = probe_interval
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.Client(
+            base_url=self.base_url,
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._reachable = False
+        self._probed_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def available(self) -> bool:
+        # Only the first check waits for the server; later ones refresh in the background,
+        # since callers include the event loop
+        with self._lock:
+            first = self._probed_at is None
+            refresh = (not first and not self._probing
+                       and time.monotonic() - self._probed_at >= self.probe_interval)
+            self._probing = self._probing or refresh
+        if first:
+            self._probe()
+        elif refresh:
+            threading.Thread(target=self._probe, name="inference-probe", daemon=True).start()
+        return self._reachable
+
+    def _probe(self) -> None:
+        try:
+            reachable = self.client.get("/v1/models", timeout=self.connect_timeout).is_success
+        except httpx.HTTPError:
+            reachable = False
+        with self._lock:
+            if reachable != self._reachable:
+                print(f"Inference server {self.base_url} is {'reachable' if reachable else 'unreachable'}")
+            self._reachable = reachable
+            self._probed_at = time.monotonic()
+            self._probing = False
+
+    @property
+    def model_name(self) -> str:
+        return f"{self.base_url}/{self.model}"
+
+    @property
+    def context_tokens(self) -> int:
+        return self._context_tokens
+
+    def _payload(self, instruction: str, max_new_tokens: int, temperature: float, stream: bool) -> dict:
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": instruction}],
+            "max_tokens": max_new_tokens,
+            "temperature": temperature,
+            "top_p": 0.95,
+            "stream": stream,
+        }
+
+    def _count(self, error: Optional[Exception] = None) -> None:
+        with self._lock:
+            self._requests += 1
+            self._errors += error is not None
+            if isinstance(error, httpx.TransportError):
+                # No need to wait for the next probe to stop sending requests
+                self._reachable = False
+                self._probed_at = time.monotonic()
+
+    def generate(self, instruction: str, plain_prompt: str, max_new_tokens: int, temperature: float) -> str:
+        try:
+            response = self.client.post("/v1/chat/completions", json=self._payload(instruction, max_new_tokens, temperature, False))
+            response.raise_for_status()
+            text = response.json()["choices"][0]["message"]["content"] or ""
+        except Exception as e:
+            self._count(error=e)
+            raise
+        self._count()
+        return text.strip()
+
+    def stream(self, instruction: str, plain_prompt: str, max_new_tokens: int, temperature: float) -> Iterator[str]:
+        payload = self._payload(instruction, max_new_tokens, temperature, True)
+        try:
+            with self.client.stream("POST", "/v1/chat/completions", json=payload) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    chunk = (choices[0].get("delta") or {}).get("content")
+                    if chunk:
+                        yield chunk
+        except Exception as e:
+            self._count(error=e)
+            raise
+        self._count()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {"backend": "openai", "base_url": self.base_url, "model": self.model,
+                    "requests": self._requests, "errors": self._errors}
+
+    def close(self) -> None:
+        self.client.close()
@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+from typing import List, Optional
+
+
+def fsync_directory(path: str) -> None:
+    """Make renames and removals in a directory durable (a no-op where directories cannot be opened)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def read_entries(path: str) -> List[dict]:
+    """All complete entries of a journal file, oldest first."""
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A torn last line from a crash mid-append
+                continue
+    return entries
+
+
+class WriteJournal:
+    """
+    Append-only write-ahead journal with group commit.
+
+    Writers `append` an entry, which only buffers it and returns a sequence number, then
+    `commit` that number to wait until it is on disk. The first committer writes out
+    everything buffered so far and fsyncs once; writers arriving meanwhile wait and are
+    covered by the next fsync, so a burst of concurrent saves costs one or two fsyncs
+    instead of one each.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._cond = threading.Condition()
+        self._buffer: List[str] = []
+        self._appended = 0
+        self._durable = 0
+        self._failed = 0
+        self._flushing = False
+        self._entries = 0
+        self._commits = 0
+        self._file = open(path, 'a')
+
+    def __len__(self) -> int:
+        """Entries in the journal since it was last truncated."""
+        with self._cond:
+            return self._entries
+
+    def append(self, entry: dict) -> int:
+        """Buffer an entry; returns the sequence number to pass to `commit`."""
+        line = json.dumps(entry) + "\n"
+        with self._cond:
+            self._buffer.append(line)
+            self._appended += 1
+            self._entries += 1
+            return self._appended
+
+    def commit(self, seq: Optional[int] = None) -> None:
+        """Block until entry `seq` (by default every entry appended so far) is durable."""
+        with self._cond:
+            if seq is None:
+                seq = self._appended
+            while self._durable < seq:
+                if seq <= self._failed:
+                    raise OSError(f"Journal write to {self.path} failed")
+                if self._flushing:
+                    self._cond.wait()
+                    continue
+                # Become the leader: write out the whole buffer for everyone waiting
+                self._flushing = True
+                lines, self._buffer = self._buffer, []
+                upto = self._appended
+                self._cond.release()
+                try:
+                    self._file.write("".join(lines))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                except OSError:
+                    self._cond.acquire()
+                    self._failed = upto
+                    self._flushing = False
+                    self._cond.notify_all()
+                    raise
+                self._cond.acquire()
+                self._durable = upto
+                self._commits += 1
+                self._flushing = False
+                self._cond.notify_all()
+
+    def truncate(self) -> None:
+        """Drop every entry; the caller has made their effects durable elsewhere."""
+        self.commit()
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            self._file.truncate(0)
+            self._file.seek(0)
+            os.fsync(self._file.fileno())
+            self._entries = 0
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"entries": self._entries, "appended": self._appended, "commits": self._commits}
+
+    def close(self) -> None:
+        self.commit()
+        self._file.close()
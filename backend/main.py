@@ -1,14 +1,27 @@
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
-from models import Note, NoteIn
-from storage import YAMLNoteStorage
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import AsyncIterator, List, Literal, Optional
+from models import (BulkImportResult, BulkNoteIn, EnrichmentStatus, GenerateRequest, ModelLoadRequest, Note, NoteIn,
+                    NotePage, SearchResult)
+from storage import create_storage, note_key
+from search_index import SearchIndex, highlight_snippet, tokenize
+from enrichment import EnrichmentQueue
+from chunking import split_text, truncate_text
+from inference import InferenceBackend, OpenAICompatibleBackend, TransformersBackend
+from metadata_cache import MetadataCache, cache_key
+from model_loader import ModelLoader, READY, DISABLED
 from transformers import AutoTokenizer, AutoModelForCausalLM
 import torch
 import os
+import re
+import json
+import secrets
 from dotenv import load_dotenv
 import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 
 # Load environment variables from .env file
@@ -18,21 +31,53 @@ load_dotenv()
 model = None
 tokenizer = None
 
+# "transformers" runs the model in this process; "openai" sends prompts to a separate
+# OpenAI-compatible server (llama.cpp server, vLLM, ...) at AI_BACKEND_URL
+AI_BACKEND = os.getenv("AI_BACKEND", "transformers").lower()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
-    Lifespan event handler for loading the AI model on startup.
+    Lifespan event handler for loading the AI model and starting background enrichment.
     """
-    global model, tokenizer
     
-    hf_token = os.getenv("HUGGING_FACE_HUB_TOKEN")
-    if not hf_token:
-        print("\nWARNING: HUGGING_FACE_HUB_TOKEN environment variable not set.")
-        print("AI features will be disabled. Notes will use simple fallback titles and summaries.")
-        print("To enable AI features, create a .env file in the 'backend' directory with your token.\n")
-        yield
-        return
+    # Catch the search index up with notes changed while the server was down
+    sync_start = time.time()
+    notes = storage.get_all_notes()
+    reindexed = search_index.sync({note_key(note.timestamp): note for note in notes})
+    print(f"Search index ready: {len(search_index)} notes, {reindexed} re-indexed in {time.time() - sync_start:.2f}s")
+    
+    # Loads in the background; CRUD endpoints do not need the model
+    if AI_BACKEND == "transformers":
+        load_model()
+    else:
+        print(f"Using inference server {inference.model_name} ({'reachable' if inference.available else 'unreachable'})")
+    
+    # Failed enrichments keep their missing fields in pending_fields and are retried too
+    pending = [note for note in notes if note.enrichment_status in ("pending", "failed") and note.pending_fields]
+    # One worker per batch slot lets concurrent enrichments share a batched generate call
+    workers = int(os.getenv("AI_ENRICHMENT_WORKERS", os.getenv("AI_MAX_BATCH_SIZE", "8")))
+    await enrichment_queue.start(workers=workers, pending=pending)
+    if pending:
+        print(f"Re-queued {len(pending)} notes awaiting AI enrichment")
+    
+    yield
+    
+    await enrichment_queue.stop()
+    inference.close()
+    storage_executor.shutdown(wait=True)
+    storage.close()
+    
+    # Cleanup on shutdown
+    if model is not None:
+        print("Cleaning up AI model...")
+        install_model(None, None)
 
+def choose_model_name() -> str:
+    """
+    Pick the model to load: AI_MODEL_NAME if set, otherwise Mistral-7B when the GPU has room for it
+    and a much smaller model when it does not.
+    """
     # Check GPU availability
     print("Checking GPU availability...")
     if torch.cuda.is_available():
@@ -49,8 +94,11 @@ async def lifespan(app: FastAPI):
         print("WARNING: No GPU detected. Model will run on CPU (very slow).")
         print("Consider disabling AI features for better performance.")
 
+    if os.getenv("AI_MODEL_NAME"):
+        model_name = os.getenv("AI_MODEL_NAME")
+        print(f"Using configured model: {model_name}")
     # Choose model based on GPU memory
-    if torch.cuda.is_available() and torch.cuda.get_device_properties(0).total_memory / 1024**3 >= 8:
+    elif torch.cuda.is_available() and torch.cuda.get_device_properties(0).total_memory / 1024**3 >= 8:
         model_name = "mistralai/Mistral-7B-Instruct-v0.2"
         print(f"Using large model: {model_name}")
     else:
@@ -58,85 +106,77 @@ async def lifespan(app: FastAPI):
         model_name = "microsoft/DialoGPT-medium"  # Much smaller model
         print(f"Using smaller model for limited resources: {model_name}")
         print("Note: Smaller model may provide lower quality results.")
+    return model_name
 
-    print("This may take several minutes and requires significant RAM/GPU resources.")
-    print("If the app freezes, restart without the HUGGING_FACE_HUB_TOKEN environment variable.")
-    
-    try:
-        # Set a timeout for model loading
-        import signal
-        import threading
-        
-        def load_model_with_timeout():
-            global model, tokenizer
-            try:
-                tokenizer = AutoTokenizer.from_pretrained(model_name, token=hf_token)
-                
-                # Configure device mapping based on GPU availability
-                if torch.cuda.is_available():
-                    gpu_memory = torch.cuda.get_device_properties(0).total_memory / 1024**3
-                    if gpu_memory >= 8:
-                        # Use GPU with automatic device mapping
-                        model = AutoModelForCausalLM.from_pretrained(
-                            model_name, 
-                            device_map="auto", 
-                            torch_dtype=torch.float16, 
-                            token=hf_token
-                        )
-                        print(f"Model loaded on GPU: {model.device}")
-                    else:
-                        # Use CPU offloading for low VRAM
-                        model = AutoModelForCausalLM.from_pretrained(
-                            model_name, 
-                            device_map="auto",
-                            torch_dtype=torch.float16,
-                            token=hf_token,
-                            low_cpu_mem_usage=True
-                        )
-                        print("Model loaded with CPU offloading due to low VRAM")
-                else:
-                    # Force CPU usage
-                    model = AutoModelForCausalLM.from_pretrained(
-                        model_name, 
-                        device_map="cpu",
-                        torch_dtype=torch.float32,
-                        token=hf_token,
-                        low_cpu_mem_usage=True
-                    )
-                    print("Model loaded on CPU")
-                
-                print("Model loaded successfully.")
-            except Exception as e:
-                print(f"Failed to load model: {e}")
-                model = None
-                tokenizer = None
-        
-        # Load model in a separate thread with timeout
-        model_thread = threading.Thread(target=load_model_with_timeout)
-        model_thread.daemon = True
-        model_thread.start()
-        
-        # Wait for model to load with timeout (5 minutes)
-        model_thread.join(timeout=300)
-        
-        if model_thread.is_alive():
-            print("Model loading timed out after 5 minutes. AI features will be disabled.")
-            model = None
-            tokenizer = None
-            
-    except Exception as e:
-        print(f"\nERROR: Failed to load model. {e}")
-        print("AI features will be disabled. Notes will use simple fallback titles and summaries.\n")
-        model = None
-        tokenizer = None
+def load_model_weights(model_name: str, set_stage):
+    """
+    Load a tokenizer and model from the Hugging Face hub. Runs on the model loader's thread.
+    """
+    hf_token = os.getenv("HUGGING_FACE_HUB_TOKEN")
+    set_stage("loading tokenizer", 0.05)
+    new_tokenizer = AutoTokenizer.from_pretrained(model_name, token=hf_token)
     
-    yield
+    set_stage("loading weights", 0.2)
+    # Configure device mapping based on GPU availability
+    if torch.cuda.is_available():
+        gpu_memory = torch.cuda.get_device_properties(0).total_memory / 1024**3
+        if gpu_memory >= 8:
+            # Use GPU with automatic device mapping
+            new_model = AutoModelForCausalLM.from_pretrained(
+                model_name, 
+                device_map="auto", 
+                torch_dtype=torch.float16, 
+                token=hf_token
+            )
+            print(f"Model loaded on GPU: {new_model.device}")
+        else:
+            # Use CPU offloading for low VRAM
+            new_model = AutoModelForCausalLM.from_pretrained(
+                model_name, 
+                device_map="auto",
+                torch_dtype=torch.float16,
+                token=hf_token,
+                low_cpu_mem_usage=True
+            )
+            print("Model loaded with CPU offloading due to low VRAM")
+    else:
+        # Force CPU usage
+        new_model = AutoModelForCausalLM.from_pretrained(
+            model_name, 
+            device_map="cpu",
+            torch_dtype=torch.float32,
+            token=hf_token,
+            low_cpu_mem_usage=True
+        )
+        print("Model loaded on CPU")
     
-    # Cleanup on shutdown
-    if model is not None:
-        print("Cleaning up AI model...")
-        del model
-        del tokenizer
+    print("Model loaded successfully.")
+    return new_model, new_tokenizer
+
+def install_model(new_model, new_tokenizer) -> None:
+    """Make a loaded model (or None) the one used for generation."""
+    global model, tokenizer
+    model, tokenizer = new_model, new_tokenizer
+
+model_loader = ModelLoader(load_model_weights, install_model)
+
+def load_model(model_name: str = None):
+    """
+    Start loading the AI model in the background, if a Hugging Face token is configured.
+    The API keeps serving meanwhile; see `GET /ready` for progress.
+    """
+    hf_token = os.getenv("HUGGING_FACE_HUB_TOKEN")
+    if not hf_token:
+        print("\nWARNING: HUGGING_FACE_HUB_TOKEN environment variable not set.")
+        print("AI features will be disabled. Notes will use simple fallback titles and summaries.")
+        print("To enable AI features, create a .env file in the 'backend' directory with your token.\n")
+        model_loader.disable("HUGGING_FACE_HUB_TOKEN is not set")
+        return
+
+    model_name = model_name or choose_model_name()
+    print("This may take several minutes and requires significant RAM/GPU resources.")
+    print("The API is available meanwhile; notes saved before the model is ready are enriched once it is.")
+    model_loader.start(model_name)
 
 app = FastAPI(
     title="Notepad API",
@@ -147,7 +187,54 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-storage = YAMLNoteStorage()
+storage = create_storage()
+
+def default_search_index_path() -> str:
+    """
+    Where the search index lives unless SEARCH_INDEX_PATH says otherwise: beside the notes
+    of the selected engine, so it moves with them rather than with the working directory.
+    """
+    engine = os.getenv("NOTE_STORAGE", "yaml").strip().lower()
+    if engine == "sqlite":
+        return os.path.splitext(os.getenv("NOTES_DB", "notes.db"))[0] + ".search.json"
+    if engine == "segment":
+        return os.path.join(os.getenv("NOTES_LOG_DIR", "notes_log"), ".index", "search.json")
+    return os.path.join(os.getenv("NOTES_DIR", "notes"), ".index", "search.json")
+
+search_index = SearchIndex(os.getenv("SEARCH_INDEX_PATH") or default_search_index_path())
+
+# Saves and deletes get their own threads, apart from those running blocking generation
+# (the enrichment queue's pool and, for streamed generation, the default executor), so a
+# save never waits behind the model.
+# Several threads let concurrent saves share one journal fsync.
+storage_executor = ThreadPoolExecutor(max_workers=int(os.getenv("STORAGE_WORKERS", "8")), thread_name_prefix="storage")
+
+async def run_storage(func, *args):
+    """Run a blocking storage call on the storage executor."""
+    return await asyncio.get_running_loop().run_in_executor(storage_executor, func, *args)
+
+def save_note(note: Note) -> None:
+    """Persist a note and keep the search index in step with it."""
+    storage.save_note(note)
+    search_index.add(note_key(note.timestamp), note)
+
+def save_notes(notes: List[Note]) -> None:
+    """Persist a batch of notes and index them for search."""
+    storage.save_notes(notes)
+    search_index.add_many((note_key(note.timestamp), note) for note in notes)
+
+def update_note_if_unchanged(note: Note, expected: Note) -> bool:
+    """Persist an enriched note unless it was edited meanwhile, and re-index it."""
+    if not storage.update_if_unchanged(note, expected):
+        return False
+    search_index.add(note_key(note.timestamp), note)
+    return True
+
+def remove_note(timestamp: datetime) -> bool:
+    """Delete a note from storage, then from the search index."""
+    deleted = storage.delete_note(timestamp)
+    search_index.remove(note_key(timestamp))
+    return deleted
 
 # Add CORS middleware
 app.add_middleware(
@@ -158,173 +245,329 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def generate_summary(content: str) -> str:
+def fallback_summary(content: str) -> str:
     """
-    Generates a summary for the given content using the local model.
+    Creates a simple summary from the first few words, used when the model is unavailable.
     """
-    if not model or not tokenizer:
-        # Fallback: create a simple summary from the first few words
-        words = content.split()
-        if len(words) <= 10:
-            return content
-        else:
-            return " ".join(words[:10]) + "..."
+    words = content.split()
+    if len(words) <= 10:
+        return content
+    else:
+        return " ".join(words[:10]) + "..."
+
+def fallback_title(content: str) -> str:
+    """
+    Creates a simple title from the first few words, used when the model is unavailable.
+    """
+    words = content.split()
+    if len(words) <= 5:
+        return content
+    else:
+        return " ".join(words[:5])
+
+def run_prompt(instruction: str, plain_prompt: str, max_new_tokens: int, temperature: float) -> str:
+    """
+    Generates an answer with the inference backend and returns only the newly generated text.
+    
+    Chat-style backends receive `instruction` as a message; in-process base models get
+    `plain_prompt`. In-process requests go through the generation batcher, so concurrent
+    callers share one batched model.generate call.
+    """
+    return inference.generate(instruction, plain_prompt, max_new_tokens=max_new_tokens, temperature=temperature)
+
+def prompt_token_budget() -> int:
+    """
+    Most tokens of note contents to put in one prompt: AI_PROMPT_TOKEN_BUDGET, but never
+    more than the model's context window leaves room for beside the instructions and answer.
+    """
+    budget = int(os.getenv("AI_PROMPT_TOKEN_BUDGET", "1024"))
+    return max(64, min(budget, inference.context_tokens - 256))
+
+def is_long(content: str) -> bool:
+    return inference.count_tokens(content) > prompt_token_budget()
+
+def fit_to_budget(content: str) -> str:
+    """
+    The beginning of the content, cut to the prompt token budget. Enough for titles and tags,
+    which depend mostly on how a note starts; summaries of long notes use map_summaries instead.
+    """
+    return truncate_text(content, prompt_token_budget(), inference.count_tokens)
+
+def map_summaries(content: str) -> str:
+    """
+    Map stage of summarizing a note too long for one prompt: split it into chunks that fit
+    the token budget and summarize them concurrently, so the generation batcher runs them as
+    one batch. Repeats on the joined partial summaries until they fit in a single prompt.
+    """
+    budget = prompt_token_budget()
+    max_workers = int(os.getenv("AI_MAX_BATCH_SIZE", "8"))
+    text, stage = content, 0
+    while inference.count_tokens(text) > budget:
+        stage += 1
+        stage_start = time.time()
+        chunks = split_text(text, budget, inference.count_tokens)
+        with ThreadPoolExecutor(max_workers=min(len(chunks), max_workers)) as pool:
+            partials = list(pool.map(lambda chunk: run_prompt(**summary_prompt(chunk)), chunks))
+        print(f"Map stage {stage}: summarized {len(chunks)} chunks of up to {budget} tokens in {time.time() - stage_start:.2f} seconds")
+        shorter = "\n".join(partial for partial in partials if partial)
+        if len(chunks) == 1 or len(shorter) >= len(text):
+            # Not converging (e.g. a model that echoes its input); keep what fits
+            text = truncate_text(shorter, budget, inference.count_tokens)
+            break
+        text = shorter
+    return text
+
+def reduce_prompt(partial_summaries: str) -> dict:
+    """
+    Prompt and sampling settings for the reduce stage: one summary from the partial summaries of a long note.
+    """
+    return dict(
+        instruction="The following are summaries of consecutive parts of one long note. "
+                    f"Combine them into a concise, one-sentence summary of the whole note:\n\n{partial_summaries}",
+        plain_prompt=f"Summaries of the parts of a long note:\n{partial_summaries}\nOne-sentence summary of the whole note:",
+        max_new_tokens=50,
+        temperature=0.2,
+    )
+
+def summary_prompt(content: str) -> dict:
+    """
+    Prompt and sampling settings for a one-sentence summary.
+    """
+    return dict(
+        instruction=f"Please provide a concise, one-sentence summary for the following note:\n\n{content}",
+        plain_prompt=f"Summarize this note in one sentence: {content}\nSummary:",
+        max_new_tokens=50,
+        temperature=0.2,
+    )
+
+def title_prompt(content: str) -> dict:
+    """
+    Prompt and sampling settings for a short title.
+    """
+    return dict(
+        instruction=f"Please generate a concise title (maximum 10 words) for the following note:\n\n{content}",
+        plain_prompt=f"Generate a short title for this note: {content}\nTitle:",
+        max_new_tokens=30,
+        temperature=0.3,
+    )
+
+def clean_title(title: str) -> str:
+    """
+    Removes quotes from a generated title and limits it to 10 words.
+    """
+    title = title.strip().strip('"').strip("'")
+    words = title.split()
+    if len(words) > 10:
+        title = " ".join(words[:10])
+    return title
+
+def clean_tags(tags_text: str) -> list[str]:
+    """
+    Parses a comma-separated list of generated tags, lowercased, deduplicated and limited to 3.
+    """
+    tags = [tag.strip().strip('"').strip("'").strip().lower() for tag in tags_text.split(",")]
+    return list(dict.fromkeys(tag for tag in tags if tag))[:3]
+
+def generate_summary(content: str) -> Optional[str]:
+    """
+    Generates a summary for the given content using the AI model.
+    Returns None when the model is unavailable or generation fails.
+    """
+    if not inference.available:
+        return None
     
     try:
-        # Check if we're using Mistral or a different model
-        if "mistral" in model.config._name_or_path.lower():
-            # Mistral instruct models follow a specific prompt format.
-            messages = [
-                {"role": "user", "content": f"Please provide a concise, one-sentence summary for the following note:\n\n{content}"}
-            ]
-            prompt = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-        else:
-            # For other models, use a simple prompt
-            prompt = f"Summarize this note in one sentence: {content}\nSummary:"
-        
-        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
-
-        # Generate the output
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=50,
-            pad_token_id=tokenizer.eos_token_id,
-            do_sample=True,
-            temperature=0.2,
-            top_p=0.95,
-        )
-        
-        # Decode the generated tokens to a string
-        generated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        # Extract the response based on model type
-        if "mistral" in model.config._name_or_path.lower():
-            summary = generated_text.split("[/INST]")[-1].strip()
-        else:
-            summary = generated_text.split("Summary:")[-1].strip()
-        
+        if not is_long(content):
+            return run_prompt(**summary_prompt(content))
+        partial_summaries = map_summaries(content)
+        reduce_start = time.time()
+        summary = run_prompt(**reduce_prompt(partial_summaries))
+        print(f"Reduce stage: combined partial summaries in {time.time() - reduce_start:.2f} seconds")
         return summary
     except Exception as e:
         print(f"Error generating summary: {e}")
-        # Fallback: create a simple summary from the first few words
-        words = content.split()
-        if len(words) <= 10:
-            return content
-        else:
-            return " ".join(words[:10]) + "..."
+        return None
 
-def generate_title(content: str) -> str:
+def generate_title(content: str) -> Optional[str]:
     """
-    Generates a title for the given content using the local model.
+    Generates a title for the given content using the AI model.
+    Returns None when the model is unavailable or generation fails.
     """
-    if not model or not tokenizer:
-        # Fallback: create a simple title from the first few words
-        words = content.split()
-        if len(words) <= 5:
-            return content
-        else:
-            return " ".join(words[:5])
+    if not inference.available:
+        return None
     
     try:
-        # Check if we're using Mistral or a different model
-        if "mistral" in model.config._name_or_path.lower():
-            # Mistral instruct models follow a specific prompt format.
-            messages = [
-                {"role": "user", "content": f"Please generate a concise title (maximum 10 words) for the following note:\n\n{content}"}
-            ]
-            prompt = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-        else:
-            # For other models, use a simple prompt
-            prompt = f"Generate a short title for this note: {content}\nTitle:"
-        
-        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+        return clean_title(run_prompt(**title_prompt(fit_to_budget(content))))
+    except Exception as e:
+        print(f"Error generating title: {e}")
+        return None
 
-        # Generate the output
-        outputs = model.generate(
-            **inputs,
+def generate_tags(content: str) -> Optional[list[str]]:
+    """
+    Generates tags for the given content using the AI model.
+    Returns None when the model is unavailable or generation fails.
+    """
+    if not inference.available:
+        return None
+    
+    try:
+        # Tags depend mostly on how a note starts, so long notes are cut to the token budget
+        content = fit_to_budget(content)
+        return clean_tags(run_prompt(
+            f"Please generate up to 3 relevant tags for the following note. Return only the tags separated by commas, no explanations:\n\n{content}",
+            f"Generate up to 3 relevant tags for this note, separated by commas: {content}\nTags:",
             max_new_tokens=30,
-            pad_token_id=tokenizer.eos_token_id,
-            do_sample=True,
             temperature=0.3,
-            top_p=0.95,
-        )
-        
-        # Decode the generated tokens to a string
-        generated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        # Extract the response based on model type
-        if "mistral" in model.config._name_or_path.lower():
-            title = generated_text.split("[/INST]")[-1].strip()
-        else:
-            title = generated_text.split("Title:")[-1].strip()
-        
-        # Clean up the title - remove quotes and ensure it's not too long
-        title = title.strip('"').strip("'")
-        words = title.split()
-        if len(words) > 10:
-            title = " ".join(words[:10])
-        
-        return title
+        ))
     except Exception as e:
-        print(f"Error generating title: {e}")
-        # Fallback: create a simple title from the first few words
-        words = content.split()
-        if len(words) <= 5:
-            return content
-        else:
-            return " ".join(words[:5])
+        print(f"Error generating tags: {e}")
+        return None
 
-def generate_tags(content: str) -> list[str]:
+METADATA_FIELD_RE = re.compile(r"^(?:[\W_]|\d+[.)])*(title|summary|tags?)[*_\s]*[:=\-][*_\s]*(.*)$", re.IGNORECASE)
+
+def parse_metadata(text: str) -> dict:
     """
-    Generates tags for the given content using the local model.
+    Parses a combined "Title: ... / Summary: ... / Tags: ..." answer into its fields.
+    Also accepts a JSON object with the same keys. Fields that cannot be found are left out.
     """
-    if not model or not tokenizer:
-        # Fallback: return empty list
-        return []
+    parsed = {}
+    json_match = re.search(r"\{.*\}", text, re.DOTALL)
+    if json_match:
+        try:
+            data = json.loads(json_match.group(0))
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            for key, value in data.items():
+                if isinstance(value, list):
+                    value = ", ".join(str(item) for item in value)
+                parsed[key.lower()] = str(value)
+    if not parsed:
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        for i, line in enumerate(lines):
+            match = METADATA_FIELD_RE.match(line)
+            if match:
+                parsed.setdefault(match.group(1).lower(), match.group(2))
+            elif i == 0:
+                # Plain prompts end with "Title:", so the first line is the unlabelled title
+                parsed.setdefault("title", line)
     
-    try:
-        # Check if we're using Mistral or a different model
-        if "mistral" in model.config._name_or_path.lower():
-            # Mistral instruct models follow a specific prompt format.
-            messages = [
-                {"role": "user", "content": f"Please generate up to 3 relevant tags for the following note. Return only the tags separated by commas, no explanations:\n\n{content}"}
-            ]
-            prompt = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-        else:
-            # For other models, use a simple prompt
-            prompt = f"Generate up to 3 relevant tags for this note, separated by commas: {content}\nTags:"
-        
-        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    result = {}
+    if parsed.get("title", "").strip():
+        result["title"] = clean_title(parsed["title"])
+    if parsed.get("summary", "").strip():
+        result["summary"] = parsed["summary"].strip()
+    tags = clean_tags(parsed.get("tags", parsed.get("tag", "")))
+    if tags:
+        result["tags"] = tags
+    return result
 
-        # Generate the output
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=30,
-            pad_token_id=tokenizer.eos_token_id,
-            do_sample=True,
+def generate_metadata(content: str) -> dict:
+    """
+    Generates title, summary and tags together with a single prompt, so the note is
+    prefilled once instead of three times. Returns only the fields that could be parsed.
+    """
+    if not inference.available:
+        return {}
+    
+    try:
+        content = fit_to_budget(content)
+        answer = run_prompt(
+            "Read the following note and reply with exactly three lines and nothing else:\n"
+            "Title: <a concise title, maximum 10 words>\n"
+            "Summary: <a concise, one-sentence summary>\n"
+            "Tags: <up to 3 relevant tags, separated by commas>\n\n"
+            f"Note:\n{content}",
+            "Write a short title, a one-sentence summary and up to 3 tags separated by commas for this note.\n"
+            f"Note: {content}\nTitle:",
+            max_new_tokens=110,
             temperature=0.3,
-            top_p=0.95,
         )
-        
-        # Decode the generated tokens to a string
-        generated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        # Extract the response based on model type
-        if "mistral" in model.config._name_or_path.lower():
-            tags_text = generated_text.split("[/INST]")[-1].strip()
-        else:
-            tags_text = generated_text.split("Tags:")[-1].strip()
-        
-        # Parse tags
-        tags = [tag.strip().lower() for tag in tags_text.split(",") if tag.strip()]
-        # Limit to 3 tags and remove duplicates
-        tags = list(dict.fromkeys(tags))[:3]
-        
-        return tags
+        return parse_metadata(answer)
     except Exception as e:
-        print(f"Error generating tags: {e}")
-        # Fallback: return empty list
-        return []
+        print(f"Error generating metadata: {e}")
+        return {}
+
+def enrich_fields(content: str, fields: list[str]) -> dict:
+    """
+    Generates the requested metadata fields ("title", "summary", "tags") for a note.
+    Runs on the enrichment queue's worker thread; generation is blocking.
+    
+    Fields already generated for identical contents come from the metadata cache. When more
+    than one field is still needed and AI_COMBINED_GENERATION is enabled (the default), they
+    are generated with one combined prompt; any field missing from that answer falls back
+    to its own generator. Only fields the model actually produced are returned (and cached);
+    the note keeps its fallback values for the rest.
+    """
+    # Notes saved while the model is still loading wait for it instead of keeping their fallbacks
+    if not inference.available and model_loader.loading:
+        model_loader.wait()
+    if not inference.available:
+        return {}
+    key = metadata_cache_key(content)
+    cached = {field: value for field, value in metadata_cache.get(key).items() if field in fields}
+    remaining = [field for field in fields if field not in cached]
+    generated = {}
+    
+    # The combined prompt only sees as much of a long note as fits the token budget, so the
+    # summary of a long note is left to generate_summary's map-reduce
+    combined = [field for field in remaining if field != "summary" or not is_long(content)]
+    if len(combined) > 1 and os.getenv("AI_COMBINED_GENERATION", "true").lower() in ("1", "true", "yes"):
+        combined_start = time.time()
+        generated.update({field: value for field, value in generate_metadata(content).items() if field in combined})
+        print(f"Combined generation of {combined} took {time.time() - combined_start:.2f} seconds")
+    
+    for field, generate in (("tags", generate_tags), ("title", generate_title), ("summary", generate_summary)):
+        if field in remaining and field not in generated:
+            field_start = time.time()
+            value = generate(content)
+            print(f"{field.capitalize()} generation took {time.time() - field_start:.2f} seconds")
+            # Never replace a fallback with an empty generation
+            if value is not None and (field == "tags" or value.strip()):
+                generated[field] = value
+    
+    metadata_cache.put(key, generated)
+    return {**cached, **generated}
+
+enrichment_queue = EnrichmentQueue(storage, enrich_fields, update_note_if_unchanged, storage_executor)
+
+# Bump whenever a generation prompt changes, so metadata cached for older prompts is not reused
+PROMPT_VERSION = "1"
+
+metadata_cache = MetadataCache(
+    os.getenv("METADATA_CACHE_PATH", "metadata_cache.db"),
+    max_entries=int(os.getenv("METADATA_CACHE_MAX_ENTRIES", "10000")),
+)
+
+def metadata_cache_key(content: str) -> str:
+    """
+    Cache key for generated metadata of the given (cleaned) content with the current model.
+    """
+    return cache_key(content, inference.model_name, PROMPT_VERSION)
+
+def create_inference_backend() -> InferenceBackend:
+    """
+    Create the inference backend selected by AI_BACKEND.
+    """
+    if AI_BACKEND == "openai":
+        return OpenAICompatibleBackend(
+            os.getenv("AI_BACKEND_URL", "http://127.0.0.1:8080"),
+            model=os.getenv("AI_BACKEND_MODEL", "default"),
+            api_key=os.getenv("AI_BACKEND_API_KEY"),
+            timeout=float(os.getenv("AI_BACKEND_TIMEOUT", "60")),
+            max_connections=int(os.getenv("AI_BACKEND_MAX_CONNECTIONS", "16")),
+            context_tokens=int(os.getenv("AI_BACKEND_CONTEXT_TOKENS", "4096")),
+            probe_interval=float(os.getenv("AI_BACKEND_PROBE_INTERVAL", "5")),
+        )
+    if AI_BACKEND != "transformers":
+        raise ValueError(f"Unknown AI_BACKEND '{AI_BACKEND}', expected 'transformers' or 'openai'")
+    return TransformersBackend(
+        lambda: (model, tokenizer),
+        window_ms=float(os.getenv("AI_BATCH_WINDOW_MS", "20")),
+        max_batch_size=int(os.getenv("AI_MAX_BATCH_SIZE", "8")),
+    )
+
+inference = create_inference_backend()
 
 def parse_user_tags(tags_input: str) -> list[str]:
     """
@@ -400,26 +643,20 @@ def extract_tags_from_content(content: str) -> tuple[list[str], str]:
     
     return tags, cleaned_content.strip()
 
-@app.post("/notes/", response_model=Note, tags=["Notes"], summary="Create a new note with AI-generated title, summary, and tags")
-async def create_note(note_in: NoteIn):
+def prepare_note(note_in: NoteIn, timestamp: datetime = None) -> Note:
     """
-    Create a new note. The title, summary, and tags will be generated automatically if not provided.
-    
-    - **title**: The title of the note (optional - will be auto-generated if not provided)
-    - **contents**: The full content of the note
-    - **tags**: Tags/categories separated by commas (optional - will be auto-generated if not provided)
+    Builds a note from user input. Missing title, summary and tags get fallback values
+    and are marked as pending, so the enrichment queue can generate them in the background.
+    Reads the metadata cache, so endpoints run it on the storage executor.
     """
-    start_time = time.time()
-    
-    print(f"Received note creation request: title='{note_in.title}', contents_length={len(note_in.contents)}, tags='{note_in.tags}'")
-    
     # Extract tags from content first
     content_tags, cleaned_content = extract_tags_from_content(note_in.contents)
     print(f"Extracted tags from content: {content_tags}")
     print(f"Cleaned content length: {len(cleaned_content)}")
     
+    pending_fields = []
+    
     # Process tags (user input takes precedence over content tags)
-    tags_start = time.time()
     if note_in.tags and note_in.tags.strip():
         # User provided tags in the tags field
         tags = parse_user_tags(note_in.tags)
@@ -429,37 +666,163 @@ async def create_note(note_in: NoteIn):
         tags = content_tags
         print(f"Tags extracted from content: {tags}")
     else:
-        # Generate tags using AI
-        tags = generate_tags(cleaned_content)
-        print(f"AI generated tags: {tags}")
-    print(f"Tags processing took {time.time() - tags_start:.2f} seconds")
-    
-    # Generate title if not provided or empty
-    title_start = time.time()
-    title = note_in.title if note_in.title and note_in.title.strip() else generate_title(cleaned_content)
-    print(f"Title generation took {time.time() - title_start:.2f} seconds")
-    
-    # Generate summary
-    summary_start = time.time()
-    summary = generate_summary(cleaned_content)
-    print(f"Summary generation took {time.time() - summary_start:.2f} seconds")
-    
-    note = Note(
+        # Tags will be generated by the AI
+        tags = []
+        pending_fields.append("tags")
+    
+    # Use the provided title, or a fallback until the AI has generated one
+    if note_in.title and note_in.title.strip():
+        title = note_in.title
+    else:
+        title = fallback_title(cleaned_content)
+        pending_fields.append("title")
+    
+    # The summary is always generated
+    summary = fallback_summary(cleaned_content)
+    pending_fields.append("summary")
+    
+    fields = dict(
         title=title,
         contents=cleaned_content,
         summary=summary,
-        tags=tags
+        tags=tags,
     )
     
-    storage.save_note(note)
-    print(f"Note created successfully: {note.title} with tags {tags} (total time: {time.time() - start_time:.2f}s)")
+    if not inference.available:
+        # Without a model the fallbacks are all we will get, unless one is still loading;
+        # the enrichment queue then waits for it
+        if not model_loader.loading:
+            pending_fields = []
+    elif pending_fields:
+        # Reuse metadata already generated for identical contents
+        cached = metadata_cache.get(metadata_cache_key(cleaned_content))
+        for field in list(pending_fields):
+            if field in cached:
+                fields[field] = cached[field]
+                pending_fields.remove(field)
+        if cached:
+            print(f"Reused cached metadata {sorted(cached)}, still pending: {pending_fields}")
+    
+    fields["enrichment_status"] = "pending" if pending_fields else "done"
+    fields["pending_fields"] = pending_fields
+    if timestamp is not None:
+        fields["timestamp"] = timestamp  # Keep the original timestamp
+    return Note(**fields)
+
+@app.post("/notes/", response_model=Note, tags=["Notes"], summary="Create a new note with AI-generated title, summary, and tags")
+async def create_note(note_in: NoteIn):
+    """
+    Create a new note. The title, summary, and tags will be generated automatically if not provided.
+    
+    The note is saved and returned right away with fallback values; AI generation runs in the
+    background while `enrichment_status` is "pending" (see `GET /notes/{timestamp}/status`).
+    
+    - **title**: The title of the note (optional - will be auto-generated if not provided)
+    - **contents**: The full content of the note
+    - **tags**: Tags/categories separated by commas (optional - will be auto-generated if not provided)
+    """
+    start_time = time.time()
+    
+    print(f"Received note creation request: title='{note_in.title}', contents_length={len(note_in.contents)}, tags='{note_in.tags}'")
+    
+    note = await run_storage(prepare_note, note_in)
+    # Off the event loop, so that concurrent saves can share one journal fsync
+    await run_storage(save_note, note)
+    if note.pending_fields:
+        enrichment_queue.submit(note.timestamp)
+    print(f"Note created successfully: {note.title} with tags {note.tags}, pending {note.pending_fields} (total time: {time.time() - start_time:.2f}s)")
     return note
 
+# Notes saved per storage batch by the bulk import
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+
+def bulk_note(item: BulkNoteIn, enrich: str) -> Note:
+    """
+    Builds a note from a bulk import line without running the model. Missing title, summary
+    and tags get fallback values; with enrich="defer" they are marked as pending so the
+    enrichment queue generates them later.
+    """
+    tags = item.tags if isinstance(item.tags, list) else parse_user_tags(item.tags)
+    title = item.title if item.title and item.title.strip() else None
+    summary = item.summary if item.summary and item.summary.strip() else None
+    pending_fields = []
+    if enrich == "defer" and (inference.available or model_loader.loading):
+        pending_fields = [field for field, value in (("title", title), ("summary", summary), ("tags", tags)) if not value]
+    fields = dict(
+        title=title or fallback_title(item.contents),
+        summary=summary or fallback_summary(item.contents),
+        contents=item.contents,
+        tags=tags,
+        enrichment_status="pending" if pending_fields else "done",
+        pending_fields=pending_fields,
+    )
+    if item.timestamp is not None:
+        fields["timestamp"] = item.timestamp
+    return Note(**fields)
+
+async def ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    """The lines of a streamed request body, as they arrive."""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+@app.post("/notes/bulk", response_model=BulkImportResult, tags=["Notes"], summary="Import notes from NDJSON")
+async def import_notes(request: Request, enrich: Literal["skip", "defer"] = "skip"):
+    """
+    Import notes from a newline-delimited JSON body, one note per line, such as the output of
+    `GET /notes/export`. The body is read as a stream and saved in batches of `BULK_CHUNK_SIZE`
+    notes, so imports of any size use bounded memory. No AI generation runs during the import.
+    Lines that fail to parse or validate are skipped and reported; the rest are imported.
+    
+    - **enrich**: For notes without a title, summary or tags: "skip" keeps the fallback values,
+      "defer" queues them for background AI enrichment
+    """
+    start_time = time.time()
+    result = BulkImportResult(imported=0, failed=0)
+    batch: List[Note] = []
+    
+    async def save_batch(notes: List[Note]) -> None:
+        await run_storage(save_notes, notes)
+        result.imported += len(notes)
+        for note in notes:
+            if note.pending_fields:
+                enrichment_queue.submit(note.timestamp)
+                result.enrichment_queued += 1
+    
+    line_number = 0
+    async for line in ndjson_lines(request):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            batch.append(bulk_note(BulkNoteIn.model_validate_json(line), enrich))
+        except ValueError as e:
+            result.failed += 1
+            if len(result.errors) < 100:
+                result.errors.append({"line": line_number, "error": str(e)})
+            continue
+        if len(batch) >= BULK_CHUNK_SIZE:
+            await save_batch(batch)
+            batch = []
+    if batch:
+        await save_batch(batch)
+    
+    print(f"Bulk import: {result.imported} notes imported, {result.failed} failed, "
+          f"{result.enrichment_queued} queued for enrichment (total time: {time.time() - start_time:.2f}s)")
+    return result
+
 @app.put("/notes/{timestamp}", response_model=Note, tags=["Notes"], summary="Update an existing note")
 async def update_note(timestamp: datetime, note_in: NoteIn):
     """
     Update an existing note. The title, summary, and tags will be regenerated if not provided.
     
+    As with creation, regeneration happens in the background while `enrichment_status` is "pending".
+    
     - **timestamp**: The exact timestamp when the note was created
     - **title**: The title of the note (optional - will be regenerated if not provided)
     - **contents**: The full content of the note
@@ -470,52 +833,15 @@ async def update_note(timestamp: datetime, note_in: NoteIn):
     print(f"Received note update request for timestamp {timestamp}: title='{note_in.title}', contents_length={len(note_in.contents)}, tags='{note_in.tags}'")
     
     # Check if note exists
-    existing_note = storage.get_note(timestamp)
+    existing_note = await run_storage(storage.get_note, timestamp)
     if existing_note is None:
         raise HTTPException(status_code=404, detail="Note not found")
     
-    # Extract tags from content first
-    content_tags, cleaned_content = extract_tags_from_content(note_in.contents)
-    print(f"Extracted tags from content: {content_tags}")
-    print(f"Cleaned content length: {len(cleaned_content)}")
-    
-    # Process tags (user input takes precedence over content tags)
-    tags_start = time.time()
-    if note_in.tags and note_in.tags.strip():
-        # User provided tags in the tags field
-        tags = parse_user_tags(note_in.tags)
-        print(f"User provided tags: {tags}")
-    elif content_tags:
-        # Tags found in content
-        tags = content_tags
-        print(f"Tags extracted from content: {tags}")
-    else:
-        # Generate tags using AI
-        tags = generate_tags(cleaned_content)
-        print(f"AI generated tags: {tags}")
-    print(f"Tags processing took {time.time() - tags_start:.2f} seconds")
-    
-    # Generate title if not provided or empty
-    title_start = time.time()
-    title = note_in.title if note_in.title and note_in.title.strip() else generate_title(cleaned_content)
-    print(f"Title generation took {time.time() - title_start:.2f} seconds")
-    
-    # Generate summary
-    summary_start = time.time()
-    summary = generate_summary(cleaned_content)
-    print(f"Summary generation took {time.time() - summary_start:.2f} seconds")
-    
-    # Create updated note with same timestamp
-    updated_note = Note(
-        timestamp=timestamp,  # Keep the original timestamp
-        title=title,
-        contents=cleaned_content,
-        summary=summary,
-        tags=tags
-    )
-    
-    storage.save_note(updated_note)
-    print(f"Note updated successfully: {updated_note.title} with tags {tags} (total time: {time.time() - start_time:.2f}s)")
+    updated_note = await run_storage(prepare_note, note_in, timestamp)
+    await run_storage(save_note, updated_note)
+    if updated_note.pending_fields:
+        enrichment_queue.submit(updated_note.timestamp)
+    print(f"Note updated successfully: {updated_note.title} with tags {updated_note.tags}, pending {updated_note.pending_fields} (total time: {time.time() - start_time:.2f}s)")
     return updated_note
 
 @app.get("/notes/", response_model=List[Note], tags=["Notes"], summary="Get notes in a date range")
@@ -538,6 +864,42 @@ async def get_all_notes():
     print(f"Returning {len(notes)} notes from get_all_notes")
     return notes
 
+@app.get("/notes/export", tags=["Notes"], summary="Export all notes as NDJSON")
+async def export_notes():
+    """
+    Stream every note as newline-delimited JSON, one note per line. Notes are read from
+    storage one at a time rather than collected into one array, so memory use stays flat
+    however many notes there are. The output can be imported again with `POST /notes/bulk`.
+    """
+    lines = (note.model_dump_json() + "\n" for note in storage.iter_notes())
+    return StreamingResponse(lines, media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="notes.ndjson"'})
+
+@app.get("/notes/page", response_model=NotePage, tags=["Notes"], summary="Get one page of notes")
+async def get_notes_page(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[datetime] = None,
+    fields: str = "timestamp,title,summary,tags",
+):
+    """
+    Retrieve notes most recent first, one page at a time.
+    
+    - **limit**: Maximum number of notes per page
+    - **cursor**: The `next_cursor` of the previous page (omit for the first page)
+    - **fields**: Comma-separated fields to return; the default leaves out `contents`. Use "all" for every field
+    """
+    if fields.strip().lower() == "all":
+        selected = None
+    else:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = set(selected) - set(Note.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    
+    items = storage.list_notes(limit, before=cursor, fields=selected)
+    next_cursor = note_key(items[-1]["timestamp"]) if len(items) == limit else None
+    return NotePage(items=items, next_cursor=next_cursor)
+
 @app.get("/notes/{timestamp}", response_model=Note, tags=["Notes"], summary="Get a specific note")
 async def get_note(timestamp: datetime):
     """
@@ -550,6 +912,22 @@ async def get_note(timestamp: datetime):
         raise HTTPException(status_code=404, detail="Note not found")
     return note
 
+@app.get("/notes/{timestamp}/status", response_model=EnrichmentStatus, tags=["Notes"], summary="Get the AI enrichment status of a note")
+async def get_note_status(timestamp: datetime):
+    """
+    Poll whether the AI-generated title, summary and tags of a note are ready.
+    
+    - **timestamp**: The exact timestamp when the note was created
+    """
+    note = storage.get_note(timestamp)
+    if note is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return EnrichmentStatus(
+        timestamp=note.timestamp,
+        enrichment_status=note.enrichment_status,
+        pending_fields=note.pending_fields,
+    )
+
 @app.delete("/notes/{timestamp}", tags=["Notes"], summary="Delete a specific note")
 async def delete_note(timestamp: datetime):
     """
@@ -557,10 +935,109 @@ async def delete_note(timestamp: datetime):
     
     - **timestamp**: The exact timestamp when the note was created
     """
-    if not storage.delete_note(timestamp):
+    if not await run_storage(remove_note, timestamp):
         raise HTTPException(status_code=404, detail="Note not found")
     return {"message": "Note deleted successfully"}
 
+def sse_event(data: dict, event: str = None) -> str:
+    """
+    Formats one server-sent event.
+    """
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.post("/generate/stream", tags=["Notes"], summary="Stream a generated summary or title as it is produced")
+async def stream_generation(request: GenerateRequest):
+    """
+    Generate a summary or title for some note contents and stream it as server-sent events.
+    
+    Each `data:` event carries a `{"token": ...}` chunk as soon as the model produces it.
+    A final `done` event carries the complete, cleaned-up text; an `error` event reports failures.
+    
+    - **contents**: The note contents (tag prefixes like "tag: work." are stripped first)
+    - **field**: "summary" or "title"
+    """
+    _, cleaned_content = extract_tags_from_content(request.contents)
+    
+    async def events():
+        if not inference.available:
+            fallback = fallback_summary(cleaned_content) if request.field == "summary" else fallback_title(cleaned_content)
+            yield sse_event({"token": fallback})
+            yield sse_event({"field": request.field, "text": fallback}, event="done")
+            return
+        
+        start_time = time.time()
+        loop = asyncio.get_running_loop()
+        chunks = []
+        try:
+            if request.field == "title":
+                prompt = title_prompt(await loop.run_in_executor(None, fit_to_budget, cleaned_content))
+            elif await loop.run_in_executor(None, is_long, cleaned_content):
+                # Long notes are summarized in chunks first; only the final reduce stage is streamed
+                prompt = reduce_prompt(await loop.run_in_executor(None, map_summaries, cleaned_content))
+            else:
+                prompt = summary_prompt(cleaned_content)
+            tokens = await loop.run_in_executor(None, lambda: inference.stream(**prompt))
+            while True:
+                # The streamer blocks between tokens, so wait for each one off the event loop; the
+                # default executor is left to streaming, enrichment generates on its own pool
+                chunk = await loop.run_in_executor(None, next, tokens, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    if not chunks:
+                        print(f"First {request.field} token after {time.time() - start_time:.2f} seconds")
+                    chunks.append(chunk)
+                    yield sse_event({"token": chunk})
+        except Exception as e:
+            print(f"Error streaming {request.field}: {e}")
+            yield sse_event({"detail": str(e)}, event="error")
+            return
+        
+        text = "".join(chunks).strip()
+        if request.field == "title":
+            text = clean_title(text) or fallback_title(cleaned_content)
+        else:
+            text = text or fallback_summary(cleaned_content)
+        print(f"Streamed {request.field} generation took {time.time() - start_time:.2f} seconds")
+        yield sse_event({"field": request.field, "text": text}, event="done")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/search/", response_model=List[SearchResult], tags=["Search"], summary="Full-text search over notes")
+async def search_notes(q: str, limit: int = Query(20, ge=1, le=100), prefix: bool = True):
+    """
+    Search note titles, summaries and contents, ranked by relevance (BM25).
+    
+    - **q**: The search query
+    - **limit**: Maximum number of results
+    - **prefix**: Also match words starting with each query word (e.g. "meet" finds "meeting")
+    """
+    results = []
+    for key, score, terms in search_index.search(q, limit=limit, prefix=prefix):
+        note = storage.get_note(datetime.fromisoformat(key))
+        if note is None:
+            continue
+        # Prefer a snippet from the body, falling back to the field that matched
+        text = next(
+            (value for value in (note.contents, note.summary, note.title)
+             if any(token in terms for token in tokenize(value))),
+            note.contents,
+        )
+        results.append(SearchResult(
+            timestamp=note.timestamp,
+            title=note.title,
+            summary=note.summary,
+            tags=note.tags,
+            score=round(score, 4),
+            snippet=highlight_snippet(text, terms),
+        ))
+    return results
+
 @app.get("/", tags=["Health"], summary="Health check")
 async def health_check():
     """
@@ -569,7 +1046,88 @@ async def health_check():
     return {
         "status": "healthy", 
         "message": "Notepad API is running",
-        "ai_model_loaded": model is not None and tokenizer is not None
+        "ai_model_loaded": inference.available,
+        "ai_backend": AI_BACKEND,
+        "ai_model_state": model_loader.state,
+        "enrichment_queue_depth": enrichment_queue.depth
+    }
+
+@app.get("/ready", tags=["Health"], summary="AI model readiness")
+async def readiness():
+    """
+    Report whether the AI model is loaded. Responds with 503 while it is still loading
+    (or failed to load), so it can be used as a readiness probe; the notes API itself
+    is available either way, with fallback titles and summaries.
+    
+    - **state**: `not_loaded`, `loading`, `ready`, `failed` or `disabled` (no Hugging Face token);
+      `remote` with AI_BACKEND=openai, ready while the inference server answers `GET /v1/models`
+    - **stage** / **progress**: Current loading step and a rough 0-1 progress estimate
+    - **elapsed_seconds**: Time spent loading so far
+    """
+    if AI_BACKEND != "transformers":
+        # The model lives in a separate inference server
+        ready = inference.available
+        return JSONResponse(status_code=200 if ready else 503,
+                            content={"ready": ready, "state": "remote", **inference.metrics()})
+    status = model_loader.status()
+    ready = model_loader.state in (READY, DISABLED)
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, **status})
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Admin endpoints need the `X-Admin-Token` header to match ADMIN_TOKEN, and are
+    switched off entirely when ADMIN_TOKEN is not set.
+    """
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.post("/admin/model", status_code=202, dependencies=[Depends(require_admin)], tags=["Admin"], summary="Load or swap the AI model")
+async def swap_model(request: ModelLoadRequest):
+    """
+    Load a model in the background and swap it in once it is ready. The current model
+    keeps serving until then. Poll `GET /ready` for progress.
+    
+    - **model_name**: Hugging Face model to load (optional - defaults to the startup choice)
+    """
+    if AI_BACKEND != "transformers":
+        raise HTTPException(status_code=409, detail="Models can only be swapped with the in-process transformers backend")
+    model_name = request.model_name or choose_model_name()
+    try:
+        model_loader.start(model_name)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    print(f"Admin requested model swap to {model_name}")
+    return model_loader.status()
+
+@app.delete("/admin/model", dependencies=[Depends(require_admin)], tags=["Admin"], summary="Unload the AI model")
+async def unload_model():
+    """
+    Unload the AI model and free its memory. Notes get fallback metadata until a model
+    is loaded again with `POST /admin/model`.
+    """
+    if AI_BACKEND != "transformers":
+        raise HTTPException(status_code=409, detail="Models can only be unloaded with the in-process transformers backend")
+    try:
+        model_loader.unload()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model_loader.status()
+
+@app.get("/metrics", tags=["Health"], summary="Generation and enrichment metrics")
+async def get_metrics():
+    """
+    Report the generation batcher's queue depth and batch-size statistics, metadata
+    cache hits and misses, the number of notes waiting for enrichment, and the storage
+    engine's durability mode and journal group-commit counts.
+    """
+    return {
+        "generation": inference.metrics(),
+        "metadata_cache": metadata_cache.stats(),
+        "enrichment_queue_depth": enrichment_queue.depth,
+        "storage": storage.stats(),
     }
 
 @app.get("/tags/", response_model=list[str], tags=["Tags"], summary="Get all unique tags")
@@ -578,21 +1136,23 @@ async def get_all_tags():
     Retrieve all unique tags used across all notes.
     Returns a list of tag strings.
     """
-    notes = storage.get_all_notes()
-    all_tags = set()
-    
-    for note in notes:
-        if note.tags:
-            all_tags.update(note.tags)
-    
-    return sorted(list(all_tags))
+    return storage.get_all_tags()
+
+@app.get("/tags/counts", response_model=dict[str, int], tags=["Tags"], summary="Get the number of notes per tag")
+async def get_tag_counts():
+    """
+    Retrieve the number of notes carrying each tag.
+    Tags are lowercased, matching how notes are filtered.
+    """
+    return storage.get_tag_counts()
 
 @app.get("/notes/filter/", response_model=list[Note], tags=["Notes"], summary="Get notes filtered by tags")
-async def get_notes_by_tags(tags: str = ""):
+async def get_notes_by_tags(tags: str = "", match: Literal["any", "all"] = "any"):
     """
-    Retrieve notes that have any of the specified tags.
+    Retrieve notes that have any (or all) of the specified tags.
     
     - **tags**: Comma-separated list of tags to filter by (e.g., "work,important")
+    - **match**: "any" returns notes with at least one of the tags, "all" only notes with every tag
     """
     if not tags.strip():
         # If no tags specified, return all notes
@@ -601,17 +1161,7 @@ async def get_notes_by_tags(tags: str = ""):
     # Parse the tags parameter
     filter_tags = [tag.strip().lower() for tag in tags.split(",") if tag.strip()]
     
-    notes = storage.get_all_notes()
-    filtered_notes = []
-    
-    for note in notes:
-        if note.tags:
-            note_tags_lower = [tag.lower() for tag in note.tags]
-            # Check if any of the filter tags match any of the note's tags
-            if any(filter_tag in note_tags_lower for filter_tag in filter_tags):
-                filtered_notes.append(note)
-    
-    return filtered_notes
+    return storage.get_notes_by_tags(filter_tags, match)
 
 if __name__ == "__main__":
     import uvicorn
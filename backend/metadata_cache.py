@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict
+
+
+def cache_key(content: str, model_name: str, prompt_version: str) -> str:
+    """Key for generated metadata: the cleaned content, the model that produced it and the prompt version."""
+    digest = hashlib.sha256()
+    for part in (model_name, prompt_version, content):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class MetadataCache:
+    """
+    Persistent LRU cache of AI-generated note metadata (title, summary, tags).
+
+    Entries live in a small SQLite file and are evicted least-recently-used first once
+    there are more than `max_entries`. Re-saving a note with unchanged contents, or
+    saving duplicate contents, is then served from here instead of the model.
+    """
+
+    def __init__(self, path: str = "metadata_cache.db", max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS metadata (
+                    key TEXT PRIMARY KEY,
+                    fields TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_metadata_last_used ON metadata(last_used);
+            """)
+
+    def get(self, key: str) -> Dict[str, object]:
+        """Cached fields for the key (possibly only some of title/summary/tags), or an empty dict."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT fields FROM metadata WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return {}
+            self.hits += 1
+            self._conn.execute("UPDATE metadata SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, fields: Dict[str, object]) -> None:
+        """Store generated fields, merging them into any fields already cached for the key."""
+        if not fields:
+            return
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT fields FROM metadata WHERE key = ?", (key,)).fetchone()
+            merged = {**json.loads(row[0]), **fields} if row else dict(fields)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata (key, fields, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(merged), time.time()),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM metadata WHERE key IN (SELECT key FROM metadata ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()
+            return {"entries": entries, "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
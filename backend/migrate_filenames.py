@@ -0,0 +1,24 @@
+"""
+One-shot rename of note files saved with second-resolution names (2025-06-24T21-07-05.yaml)
+to the microsecond-resolution names used since (2025-06-24T21-07-05.123456.yaml).
+
+Old names keep working without it; renaming just makes every file follow one scheme.
+
+Usage:
+    poetry run python migrate_filenames.py [--notes-dir notes] [--format yaml]
+"""
+import argparse
+import time
+from storage import YAMLNoteStorage
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rename note files to microsecond-resolution names.")
+    parser.add_argument("--notes-dir", default="notes", help="Notes directory (default: notes)")
+    parser.add_argument("--format", choices=["yaml", "json"], default="yaml", help="File format of the notes (default: yaml)")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    storage = YAMLNoteStorage(args.notes_dir, format=args.format)
+    count = storage.migrate_filenames()
+    storage.close()
+    print(f"Renamed {count} note files in {args.notes_dir} in {time.time() - start_time:.2f}s")
@@ -0,0 +1,30 @@
+"""
+One-shot migration of a YAML notes directory into a SQLite database or a segmented note log.
+
+Usage:
+    poetry run python migrate_notes.py [--notes-dir notes] [--db notes.db]
+    poetry run python migrate_notes.py --to segment [--notes-dir notes] [--log-dir notes_log]
+
+Afterwards start the backend with NOTE_STORAGE=sqlite (or NOTE_STORAGE=segment) to use it.
+"""
+import argparse
+import time
+from storage import migrate_yaml_to_segment_log, migrate_yaml_to_sqlite
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import YAML notes into a SQLite database or a segmented note log.")
+    parser.add_argument("--notes-dir", default="notes", help="YAML notes directory to import (default: notes)")
+    parser.add_argument("--to", choices=["sqlite", "segment"], default="sqlite", help="Target engine (default: sqlite)")
+    parser.add_argument("--db", default="notes.db", help="SQLite database to write (default: notes.db)")
+    parser.add_argument("--log-dir", default="notes_log", help="Segment directory to write (default: notes_log)")
+    parser.add_argument("--format", choices=["yaml", "json"], default="yaml", help="File format of the notes (default: yaml)")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    if args.to == "segment":
+        target = args.log_dir
+        count = migrate_yaml_to_segment_log(args.notes_dir, args.log_dir, args.format)
+    else:
+        target = args.db
+        count = migrate_yaml_to_sqlite(args.notes_dir, args.db, args.format)
+    print(f"Imported {count} notes from {args.notes_dir} into {target} in {time.time() - start_time:.2f}s")
@@ -0,0 +1,134 @@
+import gc
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+import torch
+
+# Values of ModelLoader.state
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+DISABLED = "disabled"
+
+
+class ModelLoader:
+    """
+    Loads the language model on a background thread and swaps it in when it is ready.
+
+    The API serves requests while loading; anything that needs the model checks for it
+    and falls back, or waits with `wait()`. `load` is called as `load(name, set_stage)`
+    and returns (model, tokenizer); `set_stage` lets it report progress. Loading a new
+    model while one is in use keeps the old one serving until the new one is ready, then
+    hands both to `install` and releases the old one.
+    """
+
+    def __init__(self, load: Callable[[str, Callable[[str, float], None]], Tuple[Any, Any]],
+                 install: Callable[[Any, Any], None]):
+        self.load = load
+        self.install = install
+        self.state = NOT_LOADED
+        self.model_name: Optional[str] = None
+        self.loaded_model_name: Optional[str] = None
+        self.stage: Optional[str] = None
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self.started: Optional[float] = None
+        self.load_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def loading(self) -> bool:
+        return self.state == LOADING
+
+    def disable(self, reason: str) -> None:
+        """Mark AI features as switched off, e.g. when no Hugging Face token is configured."""
+        with self._lock:
+            self.state = DISABLED
+            self.error = reason
+            self._ready.set()
+
+    def start(self, model_name: str) -> None:
+        """Start loading `model_name` in the background. Raises RuntimeError if a load is already running."""
+        with self._lock:
+            if self.state == LOADING:
+                raise RuntimeError(f"Model {self.model_name} is still loading")
+            self.state = LOADING
+            self.model_name = model_name
+            self.stage = "starting"
+            self.progress = 0.0
+            self.error = None
+            self.started = time.time()
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run, args=(model_name,), name="model-loader", daemon=True)
+            self._thread.start()
+
+    def unload(self) -> None:
+        """Drop the current model; generation falls back until another one is loaded."""
+        with self._lock:
+            if self.state == LOADING:
+                raise RuntimeError(f"Model {self.model_name} is still loading")
+            self.install(None, None)
+            self.state = NOT_LOADED
+            self.loaded_model_name = None
+            self.stage = None
+            self.progress = 0.0
+            self._ready.set()
+        release_memory()
+        print("Model unloaded")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until no load is in progress. Returns False on timeout."""
+        return self._ready.wait(timeout)
+
+    def status(self) -> dict:
+        elapsed = time.time() - self.started if self.state == LOADING and self.started else None
+        return {
+            "state": self.state,
+            "model_name": self.model_name,
+            "loaded_model_name": self.loaded_model_name,
+            "stage": self.stage,
+            "progress": round(self.progress, 2),
+            "elapsed_seconds": round(elapsed, 1) if elapsed is not None else None,
+            "load_seconds": round(self.load_seconds, 1) if self.load_seconds is not None else None,
+            "error": self.error,
+        }
+
+    def _set_stage(self, stage: str, progress: float) -> None:
+        self.stage = stage
+        self.progress = progress
+        print(f"Model loading: {stage} ({progress:.0%})")
+
+    def _run(self, model_name: str) -> None:
+        try:
+            new_model, new_tokenizer = self.load(model_name, self._set_stage)
+        except Exception as e:
+            print(f"Failed to load model {model_name}: {e}")
+            with self._lock:
+                # A model that was already serving keeps serving
+                self.state = READY if self.loaded_model_name else FAILED
+                self.error = str(e)
+                self.stage = None
+                self._ready.set()
+            return
+
+        with self._lock:
+            self.install(new_model, new_tokenizer)
+            self.state = READY
+            self.loaded_model_name = model_name
+            self.stage = "ready"
+            self.progress = 1.0
+            self.load_seconds = time.time() - self.started
+            self._ready.set()
+        # The previous model is no longer referenced
+        release_memory()
+        print(f"Model {model_name} ready after {self.load_seconds:.1f}s")
+
+
+def release_memory() -> None:
+    """Free memory held by a dropped model, including cached GPU blocks."""
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
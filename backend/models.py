@@ -1,10 +1,27 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Any, Dict, Literal, Optional, List, Union
+import threading
+
+_timestamp_lock = threading.Lock()
+_last_timestamp = datetime.min
+
+def unique_now() -> datetime:
+    """
+    The current time, moved forward by a microsecond if needed so that no two calls in this
+    process return the same value. Note timestamps are note keys, so they must not collide.
+    """
+    global _last_timestamp
+    with _timestamp_lock:
+        now = datetime.now()
+        if now <= _last_timestamp:
+            now = _last_timestamp + timedelta(microseconds=1)
+        _last_timestamp = now
+        return now
 
 class Note(BaseModel):
     timestamp: datetime = Field(
-        default_factory=datetime.now,
+        default_factory=unique_now,
         description="Timestamp when the note was created",
         example="2024-01-15T10:30:00"
     )
@@ -31,6 +48,16 @@ class Note(BaseModel):
         example=["meeting", "project", "timeline"],
         default_factory=list
     )
+    enrichment_status: str = Field(
+        description="AI enrichment state: 'pending' while title/summary/tags are being generated in the background, then 'done' or 'failed'",
+        example="done",
+        default="done"
+    )
+    pending_fields: List[str] = Field(
+        description="Fields still waiting for AI generation (any of 'title', 'summary', 'tags')",
+        example=[],
+        default_factory=list
+    )
 
     class Config:
         json_encoders = {
@@ -62,4 +89,78 @@ class NoteIn(BaseModel):
         description="Tags/categories separated by commas (optional - will be auto-generated if not provided). Can also use 'category:' or 'tag:' prefixes.",
         example="meeting, project, timeline",
         default=""
-    ) 
\ No newline at end of file
+    )
+
+class SearchResult(BaseModel):
+    timestamp: datetime = Field(description="Timestamp of the matching note")
+    title: str = Field(description="The title of the note")
+    summary: str = Field(description="The summary of the note", default="")
+    tags: List[str] = Field(description="Tags of the note", default_factory=list)
+    score: float = Field(description="BM25 relevance score, higher is better")
+    snippet: str = Field(
+        description="Excerpt around the first match, HTML-escaped, with matched words wrapped in <mark> tags",
+        example="…the <mark>project</mark> timeline. Key points…"
+    )
+
+class EnrichmentStatus(BaseModel):
+    timestamp: datetime = Field(description="Timestamp of the note")
+    enrichment_status: str = Field(description="'pending', 'done' or 'failed'", example="pending")
+    pending_fields: List[str] = Field(description="Fields still waiting for AI generation", default_factory=list)
+
+class GenerateRequest(BaseModel):
+    contents: str = Field(
+        description="The note contents to generate from",
+        example="Today we discussed the project timeline.",
+        min_length=1
+    )
+    field: Literal["summary", "title"] = Field(
+        description="Which field to generate",
+        example="summary",
+        default="summary"
+    )
+
+class NotePage(BaseModel):
+    items: List[Dict[str, Any]] = Field(
+        description="Notes of this page, most recent first, with only the requested fields"
+    )
+    next_cursor: Optional[str] = Field(
+        description="Pass as `cursor` to fetch the next page; null on the last page",
+        example="2024-01-15T10:30:00.000000",
+        default=None
+    )
+
+class ModelLoadRequest(BaseModel):
+    model_name: Optional[str] = Field(
+        description="Hugging Face model to load; defaults to the model chosen at startup",
+        example="mistralai/Mistral-7B-Instruct-v0.2",
+        default=None
+    )
+
+class BulkNoteIn(BaseModel):
+    """One line of a bulk import; exported notes (see /notes/export) can be imported as they are."""
+    timestamp: Optional[datetime] = Field(
+        description="Timestamp of the note; an existing note with the same timestamp is replaced. Defaults to now",
+        example="2024-01-15T10:30:00",
+        default=None
+    )
+    title: Optional[str] = Field(description="The title of the note", example="Meeting Notes", default="")
+    summary: Optional[str] = Field(description="A brief summary of the note content", default="")
+    contents: str = Field(
+        description="The full content of the note",
+        example="Today we discussed the project timeline.",
+        min_length=1
+    )
+    tags: Union[List[str], str] = Field(
+        description="Tags as a list, or separated by commas",
+        example=["meeting", "project"],
+        default_factory=list
+    )
+
+class BulkImportResult(BaseModel):
+    imported: int = Field(description="Number of notes saved")
+    failed: int = Field(description="Number of lines that could not be imported")
+    errors: List[Dict[str, Any]] = Field(
+        description="Line number and error of the first failed lines",
+        default_factory=list
+    )
+    enrichment_queued: int = Field(description="Notes queued for AI enrichment (with enrich=defer)", default=0)
@@ -0,0 +1,62 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Type
+import yaml
+from models import Note
+
+# libyaml's C parser and emitter are several times faster than the pure-Python ones
+try:
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+    LIBYAML = True
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+    LIBYAML = False
+
+
+class NoteCodec(ABC):
+    """How a note is laid out in its file: `extension` names the files, `encode`/`decode` convert them."""
+
+    extension = ""
+
+    @abstractmethod
+    def encode(self, note: Note) -> str:
+        pass
+
+    @abstractmethod
+    def decode(self, text: str) -> Note:
+        pass
+
+
+class YAMLCodec(NoteCodec):
+    """The original format, read and written through libyaml when it is installed."""
+
+    extension = ".yaml"
+
+    def encode(self, note: Note) -> str:
+        return yaml.dump(note.model_dump(), Dumper=SafeDumper)
+
+    def decode(self, text: str) -> Note:
+        return Note(**yaml.load(text, Loader=SafeLoader))
+
+
+class JSONCodec(NoteCodec):
+    """Compact JSON; much faster to load than YAML."""
+
+    extension = ".json"
+
+    def encode(self, note: Note) -> str:
+        return note.model_dump_json()
+
+    def decode(self, text: str) -> Note:
+        # Parsing and validating in one pass beats json.loads followed by Note(**data)
+        return Note.model_validate_json(text)
+
+
+CODECS: Dict[str, Type[NoteCodec]] = {"yaml": YAMLCodec, "json": JSONCodec}
+
+
+def get_codec(name: str) -> NoteCodec:
+    """The codec for a NOTES_FORMAT value."""
+    try:
+        return CODECS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown note format: {name!r} (expected one of {', '.join(CODECS)})")
@@ -0,0 +1,253 @@
+import bisect
+import hashlib
+import html
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from models import Note
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Matches in the title count more than matches in the summary, which count more than the body
+FIELD_WEIGHTS = {"title": 3.0, "summary": 1.5, "contents": 1.0}
+
+# Upper bound on index terms a single prefix may expand to
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def tokenize(text: str) -> List[str]:
+    return [token.lower() for token in TOKEN_RE.findall(text)]
+
+
+def note_fingerprint(note: Note) -> str:
+    """Hash of the indexed fields, used to tell whether a stored note changed."""
+    digest = hashlib.sha1()
+    for field in FIELD_WEIGHTS:
+        digest.update(getattr(note, field).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SearchIndex:
+    """
+    Incremental inverted index over note title, summary and contents, ranked with BM25.
+
+    Term frequencies are weighted per field (see FIELD_WEIGHTS). Each document is keyed
+    by its note key and stored with a fingerprint of its text, so `sync` only
+    re-tokenizes notes that changed. Like TagIndex, the index is persisted as a
+    snapshot plus an append-only log of add/remove operations.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75,
+                 compact_after: int = 2000):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.compact_after = compact_after
+        self._lock = threading.RLock()
+        # key -> (fingerprint, weighted length, {term: weighted tf})
+        self._docs: Dict[str, Tuple[str, float, Dict[str, float]]] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._terms: List[str] = []  # sorted, for prefix lookups
+        self._total_length = 0.0
+        self._log_entries = 0
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._load()
+
+    @property
+    def _log_path(self) -> str:
+        return f"{self.path}.log"
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _load(self) -> None:
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    for key, (fingerprint, length, terms) in json.load(f).get("docs", {}).items():
+                        self._put(key, fingerprint, length, terms)
+            except (OSError, ValueError) as e:
+                print(f"Could not read search index {self.path}, starting empty: {e}")
+        if os.path.exists(self._log_path):
+            with open(self._log_path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-append
+                        continue
+                    if entry.get("op") == "add":
+                        self._put(entry["key"], entry["fingerprint"], entry["length"], entry["terms"])
+                    elif entry.get("op") == "remove":
+                        self._remove(entry["key"])
+                    self._log_entries += 1
+
+    def _append(self, *entries: dict) -> None:
+        if not self.path or not entries:
+            return
+        with open(self._log_path, 'a') as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        self._log_entries += len(entries)
+        if self._log_entries >= self.compact_after:
+            self.compact()
+
+    def _put(self, key: str, fingerprint: str, length: float, terms: Dict[str, float]) -> None:
+        self._remove(key)
+        self._docs[key] = (fingerprint, length, terms)
+        self._total_length += length
+        for term, tf in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                bisect.insort(self._terms, term)
+            postings[key] = tf
+
+    def _remove(self, key: str) -> None:
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        self._total_length -= doc[1]
+        for term in doc[2]:
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect.bisect_left(self._terms, term)]
+
+    def add(self, key: str, note: Note) -> None:
+        """Index (or re-index) a note under the given key."""
+        self.add_many([(key, note)])
+
+    def add_many(self, items: Iterable[Tuple[str, Note]]) -> None:
+        """Index several (key, note) pairs, appending them to the log in one write."""
+        entries = []
+        for key, note in items:
+            fingerprint = note_fingerprint(note)
+            with self._lock:
+                doc = self._docs.get(key)
+                if doc is not None and doc[0] == fingerprint:
+                    continue
+            terms: Counter = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(getattr(note, field)):
+                    terms[token] += weight
+            entries.append({"op": "add", "key": key, "fingerprint": fingerprint,
+                            "length": sum(terms.values()), "terms": dict(terms)})
+        with self._lock:
+            for entry in entries:
+                self._put(entry["key"], entry["fingerprint"], entry["length"], entry["terms"])
+            self._append(*entries)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            if key not in self._docs:
+                return
+            self._remove(key)
+            self._append({"op": "remove", "key": key})
+
+    def sync(self, notes: Dict[str, Note]) -> int:
+        """Bring the index in line with the given key -> note mapping. Returns the number of notes re-indexed."""
+        changed = 0
+        with self._lock:
+            stale = set(self._docs) - set(notes)
+        for key in stale:
+            self.remove(key)
+        for key, note in notes.items():
+            doc = self._docs.get(key)
+            if doc is None or doc[0] != note_fingerprint(note):
+                self.add(key, note)
+                changed += 1
+        if changed or stale:
+            self.compact()
+        return changed
+
+    def _expand(self, term: str, prefix: bool) -> List[str]:
+        if not prefix:
+            return [term] if term in self._postings else []
+        start = bisect.bisect_left(self._terms, term)
+        expanded = []
+        for candidate in self._terms[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not candidate.startswith(term):
+                break
+            expanded.append(candidate)
+        return expanded
+
+    def search(self, query: str, limit: int = 20, prefix: bool = True) -> List[Tuple[str, float, List[str]]]:
+        """
+        Rank documents against the query with BM25.
+
+        With `prefix`, every query token also matches index terms starting with it.
+        Returns (key, score, matched terms) tuples, best first.
+        """
+        with self._lock:
+            if not self._docs:
+                return []
+            doc_count = len(self._docs)
+            avg_length = self._total_length / doc_count or 1.0
+            scores: Dict[str, float] = {}
+            matched: Dict[str, set] = {}
+            for token in dict.fromkeys(tokenize(query)):
+                for term in self._expand(token, prefix):
+                    postings = self._postings[term]
+                    idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for key, tf in postings.items():
+                        length = self._docs[key][1]
+                        norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                        scores[key] = scores.get(key, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                        matched.setdefault(key, set()).add(term)
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [(key, score, sorted(matched[key])) for key, score in ranked]
+
+    def compact(self) -> None:
+        """Write a fresh snapshot and truncate the operation log."""
+        if not self.path:
+            return
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"version": 1, "docs": self._docs}, f)
+            os.replace(tmp_path, self.path)
+            if os.path.exists(self._log_path):
+                os.remove(self._log_path)
+            self._log_entries = 0
+
+
+def highlight_snippet(text: str, terms: Iterable[str], width: int = 160) -> str:
+    """
+    Cut a window of `text` around the first matched term and wrap matches in <mark> tags.
+
+    The rest of the text is HTML-escaped, so the snippet can be rendered as markup.
+    """
+    terms = set(terms)
+    matches = [m for m in TOKEN_RE.finditer(text) if m.group(0).lower() in terms]
+    if matches:
+        start = max(0, matches[0].start() - width // 4)
+    else:
+        start = 0
+    end = min(len(text), start + width)
+    # Do not cut words in half at the window edges
+    while start > 0 and text[start - 1].isalnum():
+        start -= 1
+    while end < len(text) and text[end].isalnum():
+        end += 1
+
+    parts = ["…" if start > 0 else ""]
+    position = start
+    for m in matches:
+        if m.start() < start:
+            continue
+        if m.end() > end:
+            break
+        parts.append(html.escape(text[position:m.start()]))
+        parts.append(f"<mark>{html.escape(m.group(0))}</mark>")
+        position = m.end()
+    parts.append(html.escape(text[position:end]))
+    if end < len(text):
+        parts.append("…")
+    return "".join(parts).replace("\n", " ")
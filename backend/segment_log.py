@@ -0,0 +1,310 @@
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+from journal import fsync_directory
+
+# Record header: crc32 of everything after it, value length, key length, kind
+HEADER = struct.Struct("<IIHB")
+PUT = 0
+TOMBSTONE = 1
+SEGMENT_SUFFIX = ".seg"
+
+
+class Segment:
+    """One segment file. Sealed segments of at least `mmap_min_bytes` are read through mmap."""
+
+    def __init__(self, path: str, segment_id: int):
+        self.path = path
+        self.id = segment_id
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+        # Bytes of records that are superseded, deleted or tombstones
+        self.garbage = 0
+        self._file = open(path, 'rb') if os.path.exists(path) else None
+        self._map: Optional[mmap.mmap] = None
+        # Reads that are not mapped seek the shared file handle (os.pread is not on Windows)
+        self._read_lock = threading.Lock()
+
+    def map(self, mmap_min_bytes: int) -> None:
+        if self._map is None and self.size >= mmap_min_bytes:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, offset: int, length: int) -> bytes:
+        if self._map is not None:
+            return self._map[offset:offset + length]
+        with self._read_lock:
+            if self._file is None:
+                self._file = open(self.path, 'rb')
+            self._file.seek(offset)
+            return self._file.read(length)
+
+    def records(self) -> Iterator[Tuple[int, int, str, int, int]]:
+        """
+        Read the segment front to back, yielding (record offset, record length, key, kind,
+        value offset). Stops at the first torn or corrupt record.
+        """
+        if self._file is None:
+            return
+        data = self._map if self._map is not None else self.read(0, self.size)
+        size = len(data)
+        offset = 0
+        while offset + HEADER.size <= size:
+            crc, value_len, key_len, kind = HEADER.unpack_from(data, offset)
+            end = offset + HEADER.size + key_len + value_len
+            if end > size or zlib.crc32(data[offset + 4:end]) != crc:
+                return
+            key_start = offset + HEADER.size
+            key = bytes(data[key_start:key_start + key_len]).decode("utf-8")
+            yield offset, end - offset, key, kind, key_start + key_len
+            offset = end
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SegmentLog:
+    """
+    Append-only key-value log split into numbered segment files.
+
+    Every put or delete appends a checksummed record (a delete appends a tombstone) to the
+    active segment, which is sealed once it grows past `segment_max_bytes`. An in-memory
+    index maps each live key to the segment and offset of its latest value, so reads are
+    one positioned read, and a full scan walks the segments sequentially. `compact`
+    rewrites the live records of mostly-dead segments to the head of the log and deletes
+    them. On open the index is rebuilt by scanning the segments in order, and a torn
+    record at the end of the last segment is cut off.
+
+    `durability` works as for YAMLNoteStorage: "fsync" fsyncs each record, "group" lets
+    writers share fsyncs through `commit`, "none" only fsyncs on close.
+    """
+
+    def __init__(self, directory: str, durability: str = "group", segment_max_bytes: int = 64 * 1024 * 1024,
+                 mmap_min_bytes: int = 1024 * 1024):
+        self.directory = directory
+        self.durability = durability
+        self.segment_max_bytes = segment_max_bytes
+        self.mmap_min_bytes = mmap_min_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._cond = threading.Condition()
+        self._appended = 0
+        self._durable = 0
+        self._syncing = False
+        self._commits = 0
+        # Scans in progress; compaction waits for them so no segment disappears mid-scan
+        self._scans = 0
+        # key -> (segment id, value offset, value length, record length)
+        self._index: Dict[str, Tuple[int, int, int, int]] = {}
+        self._segments: Dict[int, Segment] = {}
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit():
+                segment_id = int(name[:-len(SEGMENT_SUFFIX)])
+                self._segments[segment_id] = Segment(os.path.join(directory, name), segment_id)
+        for segment in self._ordered():
+            self._load(segment)
+        self._active: Optional[Segment] = None
+        self._writer = None
+        self._open_active(max(self._segments, default=0) or 1)
+
+    def _ordered(self) -> List[Segment]:
+        return [self._segments[segment_id] for segment_id in sorted(self._segments)]
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.directory, f"{segment_id:08d}{SEGMENT_SUFFIX}")
+
+    def _load(self, segment: Segment) -> None:
+        segment.map(self.mmap_min_bytes)
+        valid = 0
+        for offset, length, key, kind, value_offset in segment.records():
+            self._drop(key)
+            if kind == PUT:
+                self._index[key] = (segment.id, value_offset, length - (value_offset - offset), length)
+            else:
+                segment.garbage += length
+            valid = offset + length
+        if valid < segment.size:
+            print(f"Truncating {segment.size - valid} bytes of torn records at the end of {segment.path}")
+            segment.close()
+            with open(segment.path, 'r+b') as f:
+                f.truncate(valid)
+            segment.size = valid
+            segment._file = open(segment.path, 'rb')
+
+    def _drop(self, key: str) -> None:
+        """Forget the current value of a key, counting it as garbage in its segment."""
+        previous = self._index.pop(key, None)
+        if previous is not None:
+            self._segments[previous[0]].garbage += previous[3]
+
+    def _open_active(self, segment_id: int) -> None:
+        path = self._segment_path(segment_id)
+        self._writer = open(path, 'ab')
+        if segment_id not in self._segments:
+            self._segments[segment_id] = Segment(path, segment_id)
+        self._active = self._segments[segment_id]
+        if self._active._map is not None:
+            # The active segment grows, so it is read from the file instead
+            self._active._map.close()
+            self._active._map = None
+
+    def _roll(self) -> None:
+        """Seal the active segment and start a new one."""
+        with self._cond:
+            while self._syncing:
+                self._cond.wait()
+            if self.durability != "none":
+                os.fsync(self._writer.fileno())
+                self._durable = self._appended
+            self._writer.close()
+        sealed = self._active
+        sealed.map(self.mmap_min_bytes)
+        self._open_active(sealed.id + 1)
+        if self.durability != "none":
+            fsync_directory(self.directory)
+
+    def _append(self, key: str, kind: int, value: bytes) -> int:
+        key_bytes = key.encode("utf-8")
+        body = HEADER.pack(0, len(value), len(key_bytes), kind)[4:] + key_bytes + value
+        record = struct.pack("<I", zlib.crc32(body)) + body
+        if self._active.size and self._active.size + len(record) > self.segment_max_bytes:
+            self._roll()
+        offset = self._active.size
+        self._writer.write(record)
+        self._writer.flush()
+        if self.durability == "fsync":
+            os.fsync(self._writer.fileno())
+        self._active.size += len(record)
+        self._drop(key)
+        if kind == PUT:
+            self._index[key] = (self._active.id, offset + len(record) - len(value), len(value), len(record))
+        else:
+            self._active.garbage += len(record)
+        with self._cond:
+            self._appended += 1
+            return self._appended
+
+    def put(self, key: str, value: bytes) -> int:
+        """Append a value for the key; returns the sequence number to pass to `commit`."""
+        with self._lock:
+            return self._append(key, PUT, value)
+
+    def delete(self, key: str) -> Optional[int]:
+        """Append a tombstone for the key; returns None if the key does not exist."""
+        with self._lock:
+            if key not in self._index:
+                return None
+            return self._append(key, TOMBSTONE, b"")
+
+    def commit(self, seq: Optional[int]) -> None:
+        """In group mode, block until record `seq` is fsynced; the first waiter fsyncs for everyone."""
+        if seq is None or self.durability != "group":
+            return
+        with self._cond:
+            while self._durable < seq:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._syncing = True
+                upto = self._appended
+                fd = self._writer.fileno()
+                self._cond.release()
+                try:
+                    os.fsync(fd)
+                finally:
+                    self._cond.acquire()
+                    self._syncing = False
+                    self._cond.notify_all()
+                self._durable = max(self._durable, upto)
+                self._commits += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            location = self._index.get(key)
+            if location is None:
+                return None
+            segment_id, value_offset, value_len, _ = location
+            return self._segments[segment_id].read(value_offset, value_len)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._index
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._index)
+
+    def scan(self) -> Iterator[Tuple[str, bytes]]:
+        """
+        Every live (key, value), read sequentially segment by segment (in log order, not key order).
+        Works on a snapshot of the index, so writes during the scan are not seen.
+        """
+        with self._lock:
+            index = dict(self._index)
+            segments = self._ordered()
+            self._scans += 1
+        try:
+            for segment in segments:
+                for offset, length, key, kind, value_offset in segment.records():
+                    location = index.get(key)
+                    if kind == PUT and location is not None and location[0] == segment.id and location[1] == value_offset:
+                        yield key, segment.read(value_offset, location[2])
+        finally:
+            with self._lock:
+                self._scans -= 1
+
+    def compact(self, min_garbage_ratio: float = 0.5) -> int:
+        """
+        Rewrite the live records of sealed segments that are at least `min_garbage_ratio`
+        garbage, then delete those segments. Returns the number of segments reclaimed.
+        """
+        reclaimed = 0
+        with self._lock:
+            candidates = [segment for segment in self._ordered()
+                          if segment is not self._active and segment.size
+                          and segment.garbage / segment.size >= min_garbage_ratio]
+        for segment in candidates:
+            with self._lock:
+                if self._scans:
+                    break
+                older = any(segment_id < segment.id for segment_id in self._segments)
+                for offset, length, key, kind, value_offset in segment.records():
+                    location = self._index.get(key)
+                    if kind == PUT and location is not None and location[0] == segment.id and location[1] == value_offset:
+                        self._append(key, PUT, segment.read(value_offset, location[2]))
+                    elif kind == TOMBSTONE and older and key not in self._index:
+                        # An older segment may still hold a value this tombstone hides
+                        self._append(key, TOMBSTONE, b"")
+                # The copies must be durable before the originals go away
+                if self.durability != "none":
+                    os.fsync(self._writer.fileno())
+                    with self._cond:
+                        self._durable = self._appended
+                segment.close()
+                del self._segments[segment.id]
+                os.remove(segment.path)
+            reclaimed += 1
+        if reclaimed:
+            print(f"Compacted {reclaimed} log segments")
+        return reclaimed
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = sum(segment.size for segment in self._segments.values())
+            garbage = sum(segment.garbage for segment in self._segments.values())
+            return {"segments": len(self._segments), "live_keys": len(self._index), "bytes": size,
+                    "garbage_bytes": garbage, "commits": self._commits}
+
+    def close(self) -> None:
+        with self._lock:
+            # Even with durability "none", a clean shutdown leaves everything on disk
+            os.fsync(self._writer.fileno())
+            self._writer.close()
+            for segment in self._segments.values():
+                segment.close()
@@ -0,0 +1,109 @@
+"""
+Minimal OpenAI-compatible inference server for local testing of AI_BACKEND=openai.
+
+Answers /v1/chat/completions (streaming or not) with deterministic text built from the
+prompt, without loading any model: the combined metadata prompt gets "Title/Summary/Tags"
+lines, other prompts get the first words of the note. STUB_LATENCY_MS adds a delay per
+request (spread over the chunks when streaming) to imitate a real model.
+
+Usage:
+    poetry run python stub_inference_server.py --port 8080
+    AI_BACKEND=openai AI_BACKEND_URL=http://127.0.0.1:8080 poetry run python main.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from typing import List, Optional
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+app = FastAPI(title="Stub Inference Server", description="OpenAI-compatible stub for testing the notepad backend")
+
+LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "0"))
+
+
+class ChatMessage(BaseModel):
+    role: str
+    content: str
+
+
+class ChatCompletionRequest(BaseModel):
+    model: str = "stub"
+    messages: List[ChatMessage]
+    max_tokens: Optional[int] = 64
+    temperature: Optional[float] = 1.0
+    top_p: Optional[float] = 1.0
+    stream: bool = False
+
+
+def answer(prompt: str, max_tokens: int) -> str:
+    """A deterministic answer shaped like what the backend's prompts ask for."""
+    labelled = re.search(r"Note:\s*(.*)", prompt, re.DOTALL)
+    note = labelled.group(1) if labelled else prompt.split("\n\n")[-1]
+    words = re.findall(r"[A-Za-z0-9']+", note)
+    first = " ".join(words[:6]) or "Untitled"
+    if "Title:" in prompt and "Summary:" in prompt:
+        tags = ", ".join(dict.fromkeys(word.lower() for word in words if len(word) > 4)) or "note"
+        text = f"Title: {first}\nSummary: A note about {' '.join(words[:12]) or 'nothing'}.\nTags: {tags}"
+    elif "tags" in prompt.lower():
+        text = ", ".join(list(dict.fromkeys(word.lower() for word in words if len(word) > 4))[:3]) or "note"
+    elif "title" in prompt.lower():
+        text = first
+    else:
+        text = f"A note about {' '.join(words[:12]) or 'nothing'}."
+    # Roughly one token per word, as far as max_tokens is concerned
+    return " ".join(text.split(" ")[:max_tokens or 64])
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: ChatCompletionRequest):
+    prompt = request.messages[-1].content if request.messages else ""
+    text = answer(prompt, request.max_tokens)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    if not request.stream:
+        await asyncio.sleep(LATENCY_MS / 1000)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": request.model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(text.split()),
+                      "total_tokens": len(prompt.split()) + len(text.split())},
+        }
+
+    chunks = re.findall(r"\S+\s*|\s+", text)
+
+    async def events():
+        for chunk in chunks:
+            await asyncio.sleep(LATENCY_MS / 1000 / max(1, len(chunks)))
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": request.model,
+                    "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]}
+            yield f"data: {json.dumps(data)}\n\n"
+        data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": request.model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        yield f"data: {json.dumps(data)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Run the stub OpenAI-compatible inference server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+
+class TagIndex:
+    """
+    Inverted index from tag to note keys, with per-tag counts.
+
+    Tags are matched case-insensitively, so posting lists are keyed by the lowercased
+    tag while the original spelling is kept for listing. When a path is given the
+    index is persisted as a snapshot plus an append-only log of put/remove operations,
+    so each save or delete only appends one line; the log is folded back into the
+    snapshot once it grows past `compact_after` entries.
+    """
+
+    def __init__(self, path: Optional[str] = None, compact_after: int = 5000):
+        self.path = path
+        self.compact_after = compact_after
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Set[str]] = {}
+        self._note_tags: Dict[str, List[str]] = {}
+        self._names: Counter = Counter()
+        self._log_entries = 0
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._load()
+
+    @property
+    def _log_path(self) -> str:
+        return f"{self.path}.log"
+
+    def _load(self) -> None:
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    for key, tags in json.load(f).get("notes", {}).items():
+                        self._put(key, tags)
+            except (OSError, ValueError) as e:
+                print(f"Could not read tag index {self.path}, starting empty: {e}")
+        if os.path.exists(self._log_path):
+            with open(self._log_path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-append
+                        continue
+                    if entry.get("op") == "put":
+                        self._put(entry["key"], entry["tags"])
+                    elif entry.get("op") == "remove":
+                        self._remove(entry["key"])
+                    self._log_entries += 1
+
+    def _append(self, entry: dict) -> None:
+        if not self.path:
+            return
+        with open(self._log_path, 'a') as f:
+            f.write(json.dumps(entry) + "\n")
+        self._log_entries += 1
+        if self._log_entries >= self.compact_after:
+            self.compact()
+
+    def _put(self, key: str, tags: List[str]) -> None:
+        self._remove(key)
+        tags = list(dict.fromkeys(tags))
+        self._note_tags[key] = tags
+        self._names.update(tags)
+        for tag in {tag.lower() for tag in tags}:
+            self._postings.setdefault(tag, set()).add(key)
+
+    def _remove(self, key: str) -> None:
+        tags = self._note_tags.pop(key, None)
+        if tags is None:
+            return
+        self._names.subtract(tags)
+        for tag in tags:
+            if self._names[tag] <= 0:
+                del self._names[tag]
+        for tag in {tag.lower() for tag in tags}:
+            keys = self._postings.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[tag]
+
+    def put(self, key: str, tags: List[str]) -> None:
+        """Set the tags of a note, replacing whatever was indexed for it before."""
+        with self._lock:
+            if self._note_tags.get(key) == list(dict.fromkeys(tags)):
+                return
+            self._put(key, tags)
+            self._append({"op": "put", "key": key, "tags": self._note_tags[key]})
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            if key not in self._note_tags:
+                return
+            self._remove(key)
+            self._append({"op": "remove", "key": key})
+
+    def keys(self) -> Set[str]:
+        """All note keys present in the index."""
+        with self._lock:
+            return set(self._note_tags)
+
+    def match(self, tags: Iterable[str], match: str = "any") -> Set[str]:
+        """
+        Keys of the notes carrying the given tags.
+
+        - **match**: "any" for notes with at least one of the tags, "all" for notes with every tag
+        """
+        wanted = {tag.lower() for tag in tags}
+        with self._lock:
+            if not wanted:
+                return set()
+            postings = [self._postings.get(tag, set()) for tag in wanted]
+            if match == "all":
+                # Intersect starting from the shortest posting list
+                postings.sort(key=len)
+                result = set(postings[0])
+                for keys in postings[1:]:
+                    result &= keys
+                return result
+            return set().union(*postings)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of notes per (lowercased) tag."""
+        with self._lock:
+            return {tag: len(keys) for tag, keys in sorted(self._postings.items())}
+
+    def tags(self) -> List[str]:
+        """All distinct tags in their original spelling, sorted."""
+        with self._lock:
+            return sorted(self._names)
+
+    def compact(self) -> None:
+        """Write a fresh snapshot and truncate the operation log."""
+        if not self.path:
+            return
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"version": 1, "notes": self._note_tags}, f)
+            os.replace(tmp_path, self.path)
+            if os.path.exists(self._log_path):
+                os.remove(self._log_path)
+            self._log_entries = 0
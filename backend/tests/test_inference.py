@@ -0,0 +1,52 @@
+import socket
+import httpx
+import pytest
+import stub_inference_server
+from inference import OpenAICompatibleBackend
+
+TITLE_PROMPT = "Please generate a concise title (maximum 10 words) for the following note:\n\nQuarterly budget review with the design team"
+
+
+@pytest.fixture
+def backend(stub_server):
+    backend = OpenAICompatibleBackend(stub_server, model="stub")
+    yield backend
+    backend.close()
+
+
+def test_generate(backend):
+    assert backend.available
+    assert backend.generate(TITLE_PROMPT, "", max_new_tokens=20, temperature=0.3) == "Quarterly budget review with the design"
+    assert backend.metrics()["requests"] == 1
+    assert backend.metrics()["errors"] == 0
+
+
+def test_stream(backend):
+    chunks = list(backend.stream(TITLE_PROMPT, "", max_new_tokens=20, temperature=0.3))
+    assert len(chunks) > 1
+    assert "".join(chunks) == "Quarterly budget review with the design"
+
+
+def test_timeout(stub_server, monkeypatch):
+    monkeypatch.setattr(stub_inference_server, "LATENCY_MS", 1000)
+    backend = OpenAICompatibleBackend(stub_server, model="stub", timeout=0.2)
+    try:
+        with pytest.raises(httpx.TimeoutException):
+            backend.generate(TITLE_PROMPT, "", max_new_tokens=20, temperature=0.3)
+        assert backend.metrics()["errors"] == 1
+    finally:
+        backend.close()
+
+
+def test_unreachable_server():
+    # A port nothing listens on
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    backend = OpenAICompatibleBackend(f"http://127.0.0.1:{port}", model="stub", connect_timeout=1)
+    try:
+        assert not backend.available
+        with pytest.raises(httpx.ConnectError):
+            backend.generate(TITLE_PROMPT, "", max_new_tokens=20, temperature=0.3)
+    finally:
+        backend.close()
@@ -0,0 +1,44 @@
+import json
+import os
+from datetime import datetime
+from journal import WriteJournal, read_entries
+from models import Note
+from storage import YAMLNoteStorage
+
+
+def test_read_entries_skips_torn_tail(tmp_path):
+    path = str(tmp_path / "journal.log")
+    journal = WriteJournal(path)
+    for i in range(3):
+        journal.append({"op": "put", "file": f"{i}.yaml"})
+    journal.commit()
+    journal.close()
+    with open(path, "a") as f:
+        f.write('{"op": "put", "fi')
+
+    assert [entry["file"] for entry in read_entries(path)] == ["0.yaml", "1.yaml", "2.yaml"]
+
+
+def test_replay_with_torn_tail(tmp_path):
+    """Notes journalled before a crash are restored; the half-written last entry is ignored."""
+    notes_dir = tmp_path / "notes"
+    journal_path = notes_dir / ".index" / "journal.log"
+    os.makedirs(journal_path.parent)
+    kept = Note(timestamp=datetime(2025, 6, 24, 21, 7, 5, 123456), title="Kept", summary="s", contents="c")
+    deleted = Note(timestamp=datetime(2025, 6, 24, 21, 7, 6), title="Deleted", summary="s", contents="c")
+    with open(journal_path, "w") as f:
+        for entry in (
+            {"op": "put", "file": "2025-06-24T21-07-05.123456.yaml", "note": kept.model_dump(mode="json")},
+            {"op": "put", "file": "2025-06-24T21-07-06.000000.yaml", "note": deleted.model_dump(mode="json")},
+            {"op": "delete", "file": "2025-06-24T21-07-06.000000.yaml"},
+        ):
+            f.write(json.dumps(entry) + "\n")
+        f.write('{"op": "put", "file": "2025-06-24T21-07-07.000000.yaml", "note": {"tit')
+
+    storage = YAMLNoteStorage(str(notes_dir))
+    try:
+        assert [note.title for note in storage.get_all_notes()] == ["Kept"]
+        assert storage.get_note(kept.timestamp) == kept
+        assert not journal_path.exists() or read_entries(str(journal_path)) == []
+    finally:
+        storage.close()
@@ -0,0 +1,63 @@
+import os
+from segment_log import SEGMENT_SUFFIX, SegmentLog
+
+
+def segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+
+
+def test_reopen_truncates_torn_record(tmp_path):
+    log = SegmentLog(str(tmp_path))
+    log.put("a", b"first")
+    log.put("b", b"second")
+    log.close()
+    path = os.path.join(str(tmp_path), segment_files(str(tmp_path))[-1])
+    intact = os.path.getsize(path)
+    with open(path, "ab") as f:
+        # A record header and part of its key, as left by a crash mid-append
+        f.write(b"\x01\x02\x03\x04\x05\x00\x00\x00\x08\x00\x00ab")
+
+    log = SegmentLog(str(tmp_path))
+    try:
+        assert os.path.getsize(path) == intact
+        assert sorted(log.keys()) == ["a", "b"]
+        assert log.get("b") == b"second"
+        log.put("c", b"third")
+        assert log.get("c") == b"third"
+    finally:
+        log.close()
+    log = SegmentLog(str(tmp_path))
+    try:
+        assert sorted(log.keys()) == ["a", "b", "c"]
+    finally:
+        log.close()
+
+
+def test_compaction_keeps_tombstones_for_older_segments(tmp_path):
+    # Tiny segments, so every few records start a new one
+    log = SegmentLog(str(tmp_path), segment_max_bytes=64)
+    log.put("keep", b"v1")
+    log.put("gone", b"v1")
+    for i in range(4):
+        log.put(f"filler{i}", b"x" * 20)
+    log.put("keep", b"v2")
+    log.delete("gone")
+    for i in range(4):
+        log.delete(f"filler{i}")
+    log.put("tail", b"t")
+    before = len(segment_files(str(tmp_path)))
+
+    assert log.compact(min_garbage_ratio=0.5) > 0
+    assert len(segment_files(str(tmp_path))) < before
+    assert log.get("keep") == b"v2"
+    assert log.get("gone") is None
+    log.close()
+
+    # Deleted keys must not come back from segments that were not compacted
+    log = SegmentLog(str(tmp_path), segment_max_bytes=64)
+    try:
+        assert sorted(log.keys()) == ["keep", "tail"]
+        assert log.get("keep") == b"v2"
+        assert dict(log.scan()) == {"keep": b"v2", "tail": b"t"}
+    finally:
+        log.close()
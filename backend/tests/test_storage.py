@@ -0,0 +1,73 @@
+import os
+from datetime import datetime
+from models import Note
+from note_codec import YAMLCodec
+from storage import YAMLNoteStorage
+
+
+def write_legacy_note(notes_dir, note):
+    """A note file named the way it was before microsecond filenames."""
+    path = os.path.join(notes_dir, note.timestamp.strftime("%Y-%m-%dT%H-%M-%S") + ".yaml")
+    with open(path, "w") as f:
+        f.write(YAMLCodec().encode(note))
+    return path
+
+
+def test_legacy_filename_lookup(tmp_path):
+    note = Note(timestamp=datetime(2025, 6, 24, 21, 7, 5), title="Old", summary="s", contents="c", tags=["a"])
+    legacy_path = write_legacy_note(str(tmp_path), note)
+    storage = YAMLNoteStorage(str(tmp_path))
+    try:
+        assert storage.get_note(note.timestamp) == note
+        # Updates go to the existing file instead of creating a second one
+        storage.save_note(note.model_copy(update={"title": "Updated"}))
+        assert [name for name in os.listdir(str(tmp_path)) if name.endswith(".yaml")] == [os.path.basename(legacy_path)]
+        assert storage.get_note(note.timestamp).title == "Updated"
+        assert storage.delete_note(note.timestamp)
+        assert not os.path.exists(legacy_path)
+    finally:
+        storage.close()
+
+
+def test_migrate_filenames(tmp_path):
+    old = Note(timestamp=datetime(2025, 6, 24, 21, 7, 5), title="Old", summary="s", contents="c", tags=["a"])
+    write_legacy_note(str(tmp_path), old)
+    storage = YAMLNoteStorage(str(tmp_path))
+    new = Note(timestamp=datetime(2025, 6, 24, 21, 7, 5, 500000), title="New", summary="s", contents="c")
+    storage.save_note(new)
+    try:
+        assert storage.migrate_filenames() == 1
+        assert storage.migrate_filenames() == 0
+        files = sorted(name for name in os.listdir(str(tmp_path)) if name.endswith(".yaml"))
+        assert files == ["2025-06-24T21-07-05.000000.yaml", "2025-06-24T21-07-05.500000.yaml"]
+        assert storage.get_note(old.timestamp) == old
+        assert storage.get_notes_by_tags(["a"]) == [old]
+    finally:
+        storage.close()
+
+    reopened = YAMLNoteStorage(str(tmp_path))
+    try:
+        assert [note.title for note in reopened.get_all_notes()] == ["New", "Old"]
+    finally:
+        reopened.close()
+
+
+def test_in_place_edit_is_picked_up(tmp_path):
+    note = Note(timestamp=datetime(2025, 6, 24, 21, 7, 5, 1), title="Before", summary="s", contents="c", tags=["old"])
+    storage = YAMLNoteStorage(str(tmp_path), rescan_interval=0)
+    try:
+        storage.save_note(note)
+        assert storage.get_all_tags() == ["old"]
+        # Another writer rewrites the file without renaming it, so the directory mtime stays put
+        path = os.path.join(str(tmp_path), "2025-06-24T21-07-05.000001.yaml")
+        dir_mtime = os.stat(str(tmp_path)).st_mtime_ns
+        with open(path, "w") as f:
+            f.write(YAMLCodec().encode(note.model_copy(update={"title": "After", "tags": ["new"]})))
+        os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+        assert os.stat(str(tmp_path)).st_mtime_ns == dir_mtime
+
+        assert [n.title for n in storage.get_all_notes()] == ["After"]
+        assert [n.title for n in storage.get_notes_in_range(note.timestamp, note.timestamp)] == ["After"]
+        assert storage.get_all_tags() == ["new"]
+    finally:
+        storage.close()
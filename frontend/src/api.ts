@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { Note } from './types';
+import { Note, NotePage } from './types';
 
 // Get the current hostname to support local network access
 const getApiBaseUrl = () => {
@@ -29,8 +29,15 @@ export const getNotes = async (start: Date, end: Date): Promise<Note[]> => {
   return response.data;
 };
 
-export const getAllNotes = async (): Promise<Note[]> => {
-  const response = await api.get('/notes/all');
+// Fetches one page of notes (most recent first). Pass the previous page's next_cursor to continue.
+export const getNotesPage = async (
+  cursor?: string | null,
+  limit = 50,
+  fields = 'timestamp,title,summary,tags',
+): Promise<NotePage> => {
+  const response = await api.get('/notes/page', {
+    params: { limit, fields, ...(cursor ? { cursor } : {}) },
+  });
   return response.data;
 };
 
@@ -71,10 +78,10 @@ export const getAllTags = async (): Promise<string[]> => {
   return response.data;
 };
 
-export const getNotesByTags = async (tags: string[]): Promise<Note[]> => {
+export const getNotesByTags = async (tags: string[], match: 'any' | 'all' = 'any'): Promise<Note[]> => {
   const tagsParam = tags.join(',');
   const response = await api.get('/notes/filter/', {
-    params: { tags: tagsParam }
+    params: { tags: tagsParam, match }
   });
   return response.data;
-}; 
\ No newline at end of file
+};
@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { useQuery } from 'react-query';
+import { useInfiniteQuery, useQuery } from 'react-query';
 import {
   List,
   ListItem,
@@ -9,14 +9,15 @@ import {
   Divider,
   Chip,
   Paper,
+  Button,
   useTheme,
   useMediaQuery,
 } from '@mui/material';
 import DeleteIcon from '@mui/icons-material/Delete';
 import LocalOfferIcon from '@mui/icons-material/LocalOffer';
 import EditIcon from '@mui/icons-material/Edit';
-import { getAllNotes, deleteNote, getNotesByTags } from '../api';
-import { Note } from '../types';
+import { getNotesPage, getNotesByTags } from '../api';
+import { NoteSummary } from '../types';
 import TagFilter from './TagFilter';
 
 interface NoteListProps {
@@ -36,16 +37,35 @@ export default function NoteList({
   const isMobile = useMediaQuery(theme.breakpoints.down('md'));
   const [selectedTags, setSelectedTags] = useState<string[]>([]);
 
-  // Use different query based on whether tags are selected
-  const { data: notes = [], isLoading, error } = useQuery(
+  const isFiltering = selectedTags.length > 0;
+
+  // Without a tag filter, notes are listed a page at a time and without their contents
+  const pages = useInfiniteQuery(
+    ['notes', 'page'],
+    ({ pageParam }) => getNotesPage(pageParam),
+    {
+      getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
+      enabled: !isFiltering,
+      staleTime: 30 * 1000, // 30 seconds
+      refetchOnWindowFocus: false,
+    }
+  );
+  const filtered = useQuery(
     ['notes', selectedTags],
-    () => selectedTags.length > 0 ? getNotesByTags(selectedTags) : getAllNotes(),
+    () => getNotesByTags(selectedTags),
     {
+      enabled: isFiltering,
       staleTime: 30 * 1000, // 30 seconds
       refetchOnWindowFocus: false,
     }
   );
 
+  const notes: NoteSummary[] = isFiltering
+    ? filtered.data ?? []
+    : (pages.data?.pages ?? []).flatMap((page) => page.items);
+  const { isLoading, error } = isFiltering ? filtered : pages;
+  const hasMore = !isFiltering && !!pages.hasNextPage;
+
   const handleTagsChange = (tags: string[]) => {
     setSelectedTags(tags);
   };
@@ -84,7 +104,7 @@ export default function NoteList({
     <Paper sx={{ height: '100%', display: 'flex', flexDirection: 'column' }}>
       <Box sx={{ p: 2, borderBottom: 1, borderColor: 'divider' }}>
         <Typography variant="h6" component="h2" sx={{ mb: 2 }}>
-          Notes ({notes.length})
+          Notes ({notes.length}{hasMore ? '+' : ''})
         </Typography>
         <TagFilter selectedTags={selectedTags} onTagsChange={handleTagsChange} />
       </Box>
@@ -144,7 +164,7 @@ export default function NoteList({
                         lineHeight: 1.4,
                       }}
                     >
-                      {note.contents}
+                      {note.summary}
                     </Typography>
                     {note.tags && note.tags.length > 0 && (
                       <Box sx={{ display: 'flex', flexWrap: 'wrap', gap: 0.5, mb: 1 }}>
@@ -195,6 +215,13 @@ export default function NoteList({
             </React.Fragment>
           ))
         )}
+        {hasMore && (
+          <Box sx={{ p: 2, textAlign: 'center' }}>
+            <Button onClick={() => pages.fetchNextPage()} disabled={pages.isFetchingNextPage}>
+              {pages.isFetchingNextPage ? 'Loading...' : 'Load more'}
+            </Button>
+          </Box>
+        )}
       </List>
     </Paper>
   );
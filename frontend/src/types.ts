@@ -4,4 +4,14 @@ export interface Note {
   summary: string;
   contents: string;
   tags: string[];
-} 
\ No newline at end of file
+  enrichment_status?: 'pending' | 'done' | 'failed';
+  pending_fields?: string[];
+}
+
+// A note as listed by /notes/page: everything but the contents, which are loaded when the note is opened
+export type NoteSummary = Pick<Note, 'timestamp' | 'title' | 'summary' | 'tags'>;
+
+export interface NotePage {
+  items: NoteSummary[];
+  next_cursor: string | null;
+}
@@ -0,0 +1,114 @@
+import io
+import os
+import subprocess
+import tempfile
+import wave
+from typing import Iterator, Optional
+import numpy as np
+
+# Whisper works on 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# Bytes per sample of the signed 16-bit PCM that ffmpeg is asked to produce
+BYTES_PER_SAMPLE = 2
+
+
+def pcm16_to_float32(data: bytes) -> np.ndarray:
+    """Convert signed 16-bit little-endian PCM to the float32 waveform Whisper expects."""
+    return np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+
+
+def ffmpeg_decode_command(source: str = "-") -> list:
+    """ffmpeg command decoding `source` (a path, or "-" for stdin) to 16 kHz mono PCM on stdout."""
+    # ffmpeg must not touch stdin when reading a file, but needs it when decoding a pipe
+    input_args = ["-i", "pipe:0"] if source == "-" else ["-nostdin", "-i", source]
+    return [
+        "ffmpeg",
+        "-loglevel", "error",
+        "-threads", "0",
+        *input_args,
+        "-f", "s16le",
+        "-ac", "1",
+        "-acodec", "pcm_s16le",
+        "-ar", str(SAMPLE_RATE),
+        "-",
+    ]
+
+
+def iter_audio_windows(path: str, window_seconds: float = 30.0) -> Iterator[np.ndarray]:
+    """
+    Decode an audio file incrementally and yield it in fixed-length windows.
+
+    ffmpeg streams PCM through a pipe, and only one window is held in memory at a time,
+    so long recordings are never decoded in full. The last window may be shorter.
+    """
+    window_bytes = int(window_seconds * SAMPLE_RATE) * BYTES_PER_SAMPLE
+    process = subprocess.Popen(
+        ffmpeg_decode_command(path),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        while True:
+            data = process.stdout.read(window_bytes)
+            if not data:
+                break
+            yield pcm16_to_float32(data[:len(data) - len(data) % BYTES_PER_SAMPLE])
+        if process.wait() != 0:
+            raise RuntimeError(f"Failed to decode audio: {process.stderr.read().decode(errors='replace')}")
+    finally:
+        # Also reached when the consumer stops early, e.g. a client disconnecting mid-stream
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def decode_wav(data: bytes) -> Optional[np.ndarray]:
+    """
+    Decode a 16 kHz, 16-bit PCM WAV in memory, downmixing to mono.
+    Returns None for anything else (other rates, compressed or non-WAV audio), which needs ffmpeg.
+    """
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            if wav.getframerate() != SAMPLE_RATE or wav.getsampwidth() != BYTES_PER_SAMPLE:
+                return None
+            channels = wav.getnchannels()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    audio = pcm16_to_float32(frames[:len(frames) - len(frames) % (BYTES_PER_SAMPLE * channels)])
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    return audio
+
+
+def decode_audio_bytes(data: bytes, suffix: str = ".wav") -> np.ndarray:
+    """
+    Decode an uploaded audio file held in memory to the float32 waveform Whisper expects.
+
+    16 kHz PCM WAV is decoded directly with NumPy. Anything else is piped through ffmpeg
+    on stdin. Containers that cannot be read from a pipe (e.g. MP4 with its index at the
+    end) fall back to a temporary file, which is the only case that touches the disk.
+    """
+    audio = decode_wav(data)
+    if audio is not None:
+        return audio
+
+    result = subprocess.run(ffmpeg_decode_command("-"), input=data, capture_output=True)
+    if result.returncode == 0 and result.stdout:
+        return pcm16_to_float32(result.stdout)
+
+    print(f"Decoding from pipe failed, retrying from a temporary file: {result.stderr.decode(errors='replace').strip()}")
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        temp_file.write(data)
+    try:
+        result = subprocess.run(ffmpeg_decode_command(temp_file.name), capture_output=True)
+    finally:
+        os.unlink(temp_file.name)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to decode audio: {result.stderr.decode(errors='replace')}")
+    return pcm16_to_float32(result.stdout)
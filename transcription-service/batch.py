@@ -0,0 +1,107 @@
+import io
+import os
+import time
+import uuid
+import zipfile
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import torch
+import whisper
+from audio import SAMPLE_RATE
+
+# Extensions accepted inside zip archives (and for uploads without an audio/* content type)
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".mp4", ".aac", ".ogg", ".oga", ".opus", ".flac", ".webm", ".amr", ".3gp"}
+
+# Clips up to this long fit in one Whisper window and can be decoded in a batch
+WINDOW_SECONDS = 30
+
+
+def fits_window(audio: np.ndarray) -> bool:
+    return len(audio) <= WINDOW_SECONDS * SAMPLE_RATE
+
+
+def is_zip(filename: str, content_type: Optional[str], data: bytes) -> bool:
+    return (content_type in ("application/zip", "application/x-zip-compressed")
+            or (filename or "").lower().endswith(".zip")
+            or data[:4] == b"PK\x03\x04")
+
+
+def expand_zip(data: bytes, max_files: int) -> List[Tuple[str, bytes]]:
+    """Audio files inside a zip archive as (name, bytes), skipping folders and macOS metadata."""
+    files = []
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+                continue
+            if os.path.splitext(name)[1].lower() not in AUDIO_EXTENSIONS:
+                continue
+            if len(files) >= max_files:
+                raise ValueError(f"Archive contains more than {max_files} audio files")
+            files.append((name, archive.read(info)))
+    return files
+
+
+def transcribe_window_batch(model: whisper.model.Whisper, clips: List[np.ndarray]) -> List[str]:
+    """
+    Transcribe clips of at most 30 s with a single batched decoder pass.
+
+    Each clip is padded to one Whisper window and the log-mel spectrograms are stacked,
+    so the encoder and every decoding step run once for the whole batch instead of once
+    per file. The language is detected per clip.
+    """
+    mels = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(clip)), n_mels=model.dims.n_mels)
+        for clip in clips
+    ]).to(model.device)
+    options = whisper.DecodingOptions(fp16=model.device.type == "cuda")
+    results = whisper.decode(model, mels, options)
+    return [result.text.strip() for result in results]
+
+
+class BatchJob:
+    """State of one batch transcription job, as reported by the status endpoint."""
+
+    def __init__(self, filenames: List[str]):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.error: Optional[str] = None
+        self.results: List[Dict[str, object]] = [{"filename": name, "status": "queued"} for name in filenames]
+        # Keeps the background task referenced while it runs
+        self.task = None
+
+    def to_dict(self) -> dict:
+        completed = sum(1 for result in self.results if result["status"] in ("done", "failed"))
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": len(self.results),
+            "completed": completed,
+            "elapsed_seconds": round((self.finished or time.time()) - self.created, 2),
+            "error": self.error,
+            "results": self.results,
+        }
+
+
+class BatchJobs:
+    """In-memory registry of batch jobs; finished jobs are dropped after `ttl_seconds`."""
+
+    def __init__(self, ttl_seconds: float = 3600):
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, BatchJob] = {}
+
+    def create(self, filenames: List[str]) -> BatchJob:
+        self.prune()
+        job = BatchJob(filenames)
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        return self._jobs.get(job_id)
+
+    def prune(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in [job.id for job in self._jobs.values() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
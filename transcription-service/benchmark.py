@@ -0,0 +1,122 @@
+"""
+Benchmark Whisper model tiers on a reference clip.
+
+Each tier (and its int8 variant, with --int8) runs in a fresh subprocess so memory
+measurements are not skewed by models loaded earlier. For each one the script
+reports load time, real-time factor (transcription time / audio duration; below 1
+is faster than real time) and peak memory. Peak memory comes from the Unix-only
+`resource` module, so it is left out on Windows.
+
+Usage:
+    poetry run python benchmark.py reference.wav --tiers tiny,base,small --int8
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Optional
+from audio import SAMPLE_RATE, decode_audio_bytes
+from whisper_loader import MODEL_TIERS, load_whisper_model
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Peak resident memory of this process in MB (ru_maxrss is in KB on Linux, bytes on macOS),
+    or None where the resource module is unavailable.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(clip: str, tier: str, quantize: bool, runs: int) -> dict:
+    """Load one tier and transcribe the clip `runs` times after a warm-up run."""
+    import torch
+
+    with open(clip, "rb") as f:
+        audio = decode_audio_bytes(f.read())
+    duration = len(audio) / SAMPLE_RATE
+    baseline_mb = peak_rss_mb()
+
+    start_time = time.time()
+    model = load_whisper_model(tier, quantize=quantize)
+    load_seconds = time.time() - start_time
+    fp16 = model.device.type == "cuda"
+
+    # The first call pays for lazy initialisation (kernels, caches), so it is not timed
+    model.transcribe(audio, fp16=fp16)
+    timings = []
+    for _ in range(runs):
+        start_time = time.time()
+        result = model.transcribe(audio, fp16=fp16)
+        timings.append(time.time() - start_time)
+
+    transcribe_seconds = statistics.median(timings)
+    return {
+        "tier": tier,
+        "int8": quantize,
+        "device": str(model.device),
+        "audio_seconds": round(duration, 2),
+        "load_seconds": round(load_seconds, 2),
+        "transcribe_seconds": round(transcribe_seconds, 2),
+        "rtf": round(transcribe_seconds / duration, 3) if duration else None,
+        "peak_rss_mb": round(peak_rss_mb()) if resource is not None else None,
+        "model_rss_mb": round(peak_rss_mb() - baseline_mb) if resource is not None else None,
+        "gpu_peak_mb": round(torch.cuda.max_memory_allocated() / (1024 * 1024)) if fp16 else None,
+        "text": result["text"].strip()[:60],
+    }
+
+
+def run_tier(clip: str, tier: str, quantize: bool, runs: int) -> dict:
+    """Benchmark one tier in a subprocess and return its measurements."""
+    command = [sys.executable, __file__, clip, "--worker", "--tiers", tier, "--runs", str(runs)]
+    if quantize:
+        command.append("--int8")
+    process = subprocess.run(command, capture_output=True, text=True)
+    if process.returncode != 0:
+        return {"tier": tier, "int8": quantize, "error": process.stderr.strip().splitlines()[-1:]}
+    # The worker prints its result as the last line of stdout, after any logging
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Whisper model tiers on a reference clip")
+    parser.add_argument("clip", help="Reference audio file")
+    parser.add_argument("--tiers", default="tiny,base,small", help=f"Comma-separated model tiers ({', '.join(MODEL_TIERS)})")
+    parser.add_argument("--int8", action="store_true", help="Also benchmark int8-quantized CPU variants")
+    parser.add_argument("--runs", type=int, default=3, help="Timed transcriptions per tier (the median is reported)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    tiers = [tier.strip() for tier in args.tiers.split(",") if tier.strip()]
+    if args.worker:
+        print(json.dumps(run_worker(args.clip, tiers[0], args.int8, args.runs)))
+        return
+
+    variants = [(tier, quantize) for tier in tiers for quantize in ([False, True] if args.int8 else [False])]
+    memory_header = f" {'peak MB':>8} {'model MB':>9}" if resource is not None else ""
+    if not args.json:
+        print(f"{'tier':<10} {'int8':<5} {'device':<7} {'load s':>7} {'RTF':>7}{memory_header}  text")
+    for tier, quantize in variants:
+        result = run_tier(args.clip, tier, quantize, args.runs)
+        if args.json:
+            print(json.dumps(result))
+        elif "error" in result:
+            print(f"{tier:<10} {str(quantize):<5} failed: {' '.join(result['error'])}")
+        else:
+            memory = f" {result['peak_rss_mb']:>8} {result['model_rss_mb']:>9}" if resource is not None else ""
+            print(f"{tier:<10} {str(quantize):<5} {result['device']:<7} {result['load_seconds']:>7} {result['rtf']:>7}"
+                  f"{memory}  {result['text']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Tuple
+
+
+class QueueFullError(Exception):
+    """Raised when the admission queue is full; `retry_after` is a hint in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Transcription queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    """
+    Runs blocking Whisper inference on a dedicated thread pool behind a bounded admission queue.
+
+    At most `concurrency` jobs run at once and at most `max_queue` more may wait for a
+    worker. Requests beyond that are rejected straight away with QueueFullError instead
+    of piling up, so the event loop and the health check stay responsive under load.
+    Slots are taken and released on the event loop thread.
+    """
+
+    def __init__(self, concurrency: int = 1, max_queue: int = 4):
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="whisper")
+        self._admitted = 0
+        self._running = 0
+        self._running_lock = threading.Lock()
+        # Moving average of inference time, used for Retry-After estimates
+        self._avg_inference_seconds = 5.0
+
+    def acquire(self) -> None:
+        """Reserve an admission slot for one request, or raise QueueFullError."""
+        if self._admitted >= self.concurrency + self.max_queue:
+            waiting = self._admitted - self.concurrency + 1
+            retry_after = math.ceil(self._avg_inference_seconds * waiting / self.concurrency)
+            raise QueueFullError(max(1, retry_after))
+        self._admitted += 1
+
+    def release(self) -> None:
+        self._admitted = max(0, self._admitted - 1)
+
+    async def run(self, fn: Callable[..., Any], *args) -> Tuple[Any, float, float]:
+        """
+        Run `fn(*args)` on the pool for a request holding a slot.
+        Returns (result, queue wait seconds, inference seconds).
+        """
+        enqueued = time.monotonic()
+
+        def job():
+            started = time.monotonic()
+            with self._running_lock:
+                self._running += 1
+            try:
+                return fn(*args), started - enqueued, time.monotonic() - started
+            finally:
+                with self._running_lock:
+                    self._running -= 1
+
+        result, queue_wait, inference = await asyncio.get_running_loop().run_in_executor(self._executor, job)
+        self._avg_inference_seconds = 0.8 * self._avg_inference_seconds + 0.2 * inference
+        return result, queue_wait, inference
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "waiting": max(0, self._admitted - self._running),
+            "avg_inference_seconds": round(self._avg_inference_seconds, 2),
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,19 +1,42 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-import whisper
+from fastapi.responses import JSONResponse, StreamingResponse
 import tempfile
 import os
+import json
+import time
+import asyncio
+import threading
+import zipfile
+from typing import List, Optional, Tuple
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from audio import SAMPLE_RATE, decode_audio_bytes, iter_audio_windows
+from batch import AUDIO_EXTENSIONS, BatchJob, BatchJobs, expand_zip, fits_window, is_zip, transcribe_window_batch
+from inference_pool import InferencePool, QueueFullError
+from transcript_cache import TranscriptCache, audio_fingerprint, cache_key, pcm_fingerprint
+from vad import detect_speech, keep_speech
+from whisper_loader import load_whisper_model
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the model before accepting requests, so the first user does not pay for the cold start
+    if WHISPER_PRELOAD:
+        await asyncio.to_thread(get_whisper_model)
+    yield
+    # Drop queued transcriptions on shutdown instead of waiting for them
+    inference_pool.shutdown()
+
 app = FastAPI(
     title="Transcription Service",
     description="A microservice for converting audio to text using OpenAI Whisper",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -25,19 +48,99 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Whisper model (will be loaded on first use)
+# Whisper model size: tiny, base, small, medium or large (or a path to a checkpoint)
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+
+# Quantize the model's linear layers to int8 when running on the CPU
+WHISPER_QUANTIZE = os.getenv("WHISPER_QUANTIZE", "false").lower() in ("true", "1", "yes")
+
+# Load the model at startup instead of on the first request
+WHISPER_PRELOAD = os.getenv("WHISPER_PRELOAD", "true").lower() in ("true", "1", "yes")
+
+# Initialize Whisper model (loaded at startup, or on first use when preloading is off)
 whisper_model = None
+whisper_model_lock = threading.Lock()
+
+# Whisper runs on its own thread pool so transcriptions never block the event loop.
+# WHISPER_CONCURRENCY transcriptions run at once and WHISPER_MAX_QUEUE more may wait;
+# further requests get 503 with a Retry-After header.
+inference_pool = InferencePool(
+    concurrency=int(os.getenv("WHISPER_CONCURRENCY", "1")),
+    max_queue=int(os.getenv("WHISPER_MAX_QUEUE", "4")),
+)
+
+# Uploads are copied to disk in chunks of this size instead of being read into memory at once
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Length of the audio windows transcribed one by one by the streaming endpoint
+STREAM_WINDOW_SECONDS = float(os.getenv("STREAM_WINDOW_SECONDS", "30"))
+
+# Skip silence before transcription; frames quieter than VAD_THRESHOLD_DB (dBFS) never count as speech
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() in ("true", "1", "yes")
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "-45"))
+
+# Batch transcription: files per job, clips per batched decoder pass, and files decoded in parallel
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "100"))
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+BATCH_DECODE_WORKERS = int(os.getenv("BATCH_DECODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Finished batch jobs are kept this long for their results to be fetched
+batch_jobs = BatchJobs(ttl_seconds=float(os.getenv("BATCH_JOB_TTL_SECONDS", "3600")))
+
+# Transcripts of previously seen audio, so retried uploads skip decoding and inference.
+# With TRANSCRIPT_CACHE_NORMALIZE the decoded PCM is fingerprinted instead of the raw upload,
+# which also matches the same audio in a different container, at the cost of decoding first.
+transcript_cache = TranscriptCache(
+    os.getenv("TRANSCRIPT_CACHE_PATH", "transcript_cache.db"),
+    max_entries=int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", "10000")),
+)
+TRANSCRIPT_CACHE_NORMALIZE = os.getenv("TRANSCRIPT_CACHE_NORMALIZE", "false").lower() in ("true", "1", "yes")
 
 def get_whisper_model():
     """Get or initialize the Whisper model."""
     global whisper_model
     if whisper_model is None:
-        print("Loading Whisper model...")
-        # Use 'base' model for faster processing, can be changed to 'small', 'medium', 'large'
-        whisper_model = whisper.load_model("base")
-        print("Whisper model loaded successfully!")
+        # Several pool workers may ask for the model at once; load it only once
+        with whisper_model_lock:
+            if whisper_model is None:
+                print(f"Loading Whisper model '{WHISPER_MODEL}'...")
+                whisper_model = load_whisper_model(WHISPER_MODEL, quantize=WHISPER_QUANTIZE)
+                print("Whisper model loaded successfully!")
     return whisper_model
 
+def remove_silence(audio):
+    """
+    Cut the audio down to its speech regions when VAD is enabled.
+    Returns the audio to transcribe and the number of seconds skipped.
+    """
+    if not VAD_ENABLED:
+        return audio, 0.0
+    regions = detect_speech(audio, threshold_db=VAD_THRESHOLD_DB)
+    speech_samples = sum(end - start for start, end in regions)
+    return keep_speech(audio, regions), (len(audio) - speech_samples) / SAMPLE_RATE
+
+def transcribe_samples(audio, **options) -> str:
+    """Transcribe a waveform with the shared model; runs on the inference pool."""
+    return get_whisper_model().transcribe(audio, **options)["text"].strip()
+
+def transcript_cache_key(fingerprint: str, language: Optional[str] = None) -> str:
+    """Cache key for a transcript of this audio with the current model and settings."""
+    model_name = f"{WHISPER_MODEL}:int8" if WHISPER_QUANTIZE else WHISPER_MODEL
+    options = f"vad={VAD_ENABLED}:{VAD_THRESHOLD_DB}"
+    return cache_key(fingerprint, model_name, language, options)
+
+def cached_response(cached: dict) -> dict:
+    return {**cached, "queue_wait_ms": 0, "inference_ms": 0, "cached": True}
+
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request, exc: QueueFullError):
+    print(f"Rejecting request, transcription queue is full (retry after {exc.retry_after}s)")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 @app.get("/", tags=["Health"], summary="Health check")
 async def health_check():
     """
@@ -47,59 +150,361 @@ async def health_check():
         "status": "healthy",
         "message": "Transcription Service is running",
         "service": "transcription",
-        "model": "whisper"
+        "model": "whisper",
+        "model_size": WHISPER_MODEL,
+        "quantized": WHISPER_QUANTIZE,
+        "model_loaded": whisper_model is not None,
+        "queue": inference_pool.stats(),
+        "transcript_cache": transcript_cache.stats()
     }
 
 @app.post("/transcribe/", tags=["Transcription"], summary="Transcribe audio to text")
-async def transcribe_audio(audio_file: UploadFile = File(...)):
+async def transcribe_audio(audio_file: UploadFile = File(...), language: Optional[str] = Form(None)):
     """
     Transcribe an uploaded audio file to text using OpenAI Whisper.
     
     - **audio_file**: The audio file to transcribe (supports multiple formats)
+    - **language**: Optional language code (e.g. "en"); detected automatically if omitted
     
     Returns:
     - **transcription**: The transcribed text
+    - **queue_wait_ms**: Time spent waiting for a free Whisper worker
+    - **inference_ms**: Time spent transcribing
+    - **audio_seconds**: Length of the uploaded audio
+    - **skipped_seconds**: Silence that was not transcribed
+    - **cached**: Whether the transcript was served from the cache of earlier uploads
+    
+    Responds with 503 and a Retry-After header when the transcription queue is full.
     """
+    print(f"Received audio file: {audio_file.filename}, content_type: {audio_file.content_type}, size: {audio_file.size}")
+    
+    # Check if the file is an audio file
+    if not audio_file.content_type or not audio_file.content_type.startswith('audio/'):
+        print(f"Invalid content type: {audio_file.content_type}")
+        raise HTTPException(status_code=400, detail="File must be an audio file")
+    
+    # Read the audio file
+    audio_data = await audio_file.read()
+    print(f"Read {len(audio_data)} bytes of audio data")
+    
+    # A retried upload of the same file is answered without touching the model
+    key = None
+    if not TRANSCRIPT_CACHE_NORMALIZE:
+        key = transcript_cache_key(audio_fingerprint(audio_data), language)
+        cached = transcript_cache.get(key)
+        if cached is not None:
+            print("Returning cached transcription")
+            return cached_response(cached)
+    
+    # Reject early when too many transcriptions are already running or waiting
+    inference_pool.acquire()
     try:
-        print(f"Received audio file: {audio_file.filename}, content_type: {audio_file.content_type}, size: {audio_file.size}")
-        
-        # Check if the file is an audio file
-        if not audio_file.content_type or not audio_file.content_type.startswith('audio/'):
-            print(f"Invalid content type: {audio_file.content_type}")
-            raise HTTPException(status_code=400, detail="File must be an audio file")
+        # Decode in memory; Whisper gets the waveform directly instead of a file path
+        decode_start = time.time()
+        suffix = os.path.splitext(audio_file.filename or "")[1] or ".wav"
+        audio = await asyncio.get_running_loop().run_in_executor(None, decode_audio_bytes, audio_data, suffix)
+        audio_seconds = len(audio) / SAMPLE_RATE
+        print(f"Decoded {audio_seconds:.1f}s of audio in {time.time() - decode_start:.2f}s")
         
-        # Read the audio file
-        audio_data = await audio_file.read()
-        print(f"Read {len(audio_data)} bytes of audio data")
+        if key is None:
+            key = transcript_cache_key(pcm_fingerprint(audio), language)
+            cached = transcript_cache.get(key)
+            if cached is not None:
+                print("Returning cached transcription")
+                return cached_response(cached)
         
-        # Create a temporary file to store the audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-            temp_file.write(audio_data)
-            temp_file_path = temp_file.name
-            print(f"Saved audio to temporary file: {temp_file_path}")
+        # Only the speech regions go to Whisper
+        speech, skipped = remove_silence(audio)
+        print(f"Skipping {skipped:.1f}s of silence, transcribing {len(speech) / SAMPLE_RATE:.1f}s")
         
-        try:
-            # Get the Whisper model
-            model = get_whisper_model()
+        text, queue_wait, inference = "", 0.0, 0.0
+        if len(speech):
             print("Starting transcription...")
             
-            # Transcribe the audio
-            result = model.transcribe(temp_file_path)
-            print(f"Transcription completed: {len(result['text'])} characters")
-            
-            return {"transcription": result["text"].strip()}
-                
-        finally:
-            # Clean up the temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-                print(f"Cleaned up temporary file: {temp_file_path}")
+            # Transcribe the audio on the Whisper pool
+            text, queue_wait, inference = await inference_pool.run(
+                lambda samples: transcribe_samples(samples, language=language), speech
+            )
+            print(f"Transcription completed: {len(text)} characters (queue wait {queue_wait:.2f}s, inference {inference:.2f}s)")
+        
+        result = {"transcription": text, "audio_seconds": round(audio_seconds, 2), "skipped_seconds": round(skipped, 2)}
+        transcript_cache.put(key, result)
+        return {
+            **result,
+            "queue_wait_ms": round(queue_wait * 1000),
+            "inference_ms": round(inference * 1000),
+            "cached": False,
+        }
                 
     except Exception as e:
         print(f"Error during transcription: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
+    finally:
+        inference_pool.release()
+
+async def save_upload(audio_file: UploadFile) -> str:
+    """
+    Copy an upload to a temporary file chunk by chunk and return its path.
+    The caller is responsible for deleting the file.
+    """
+    suffix = os.path.splitext(audio_file.filename or "")[1] or ".wav"
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        size = 0
+        while True:
+            chunk = await audio_file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            temp_file.write(chunk)
+            size += len(chunk)
+    print(f"Saved {size} bytes of audio to temporary file: {temp_file.name}")
+    return temp_file.name
+
+def sse_event(data: dict, event: str = None) -> str:
+    """
+    Format one server-sent event.
+    """
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.post("/transcribe/stream", tags=["Transcription"], summary="Transcribe audio, streaming partial transcripts")
+async def transcribe_audio_stream(audio_file: UploadFile = File(...)):
+    """
+    Transcribe an uploaded audio file window by window, streaming each partial
+    transcript as a server-sent event as soon as it is ready.
+    
+    - **audio_file**: The audio file to transcribe (supports multiple formats)
+    
+    Responds with 503 and a Retry-After header when the transcription queue is full.
+    
+    Events:
+    - **data**: `{"segment", "start", "end", "text", "queue_wait_ms", "inference_ms", "skipped_seconds"}` for each window (times in seconds)
+    - **done**: `{"transcription", "skipped_seconds"}` with the full text and the total silence skipped
+    - **error**: `{"detail"}` if decoding or transcription fails
+    """
+    print(f"Received audio file for streaming: {audio_file.filename}, content_type: {audio_file.content_type}")
+    if not audio_file.content_type or not audio_file.content_type.startswith('audio/'):
+        print(f"Invalid content type: {audio_file.content_type}")
+        raise HTTPException(status_code=400, detail="File must be an audio file")
+    
+    # The slot is held for the whole stream and released when it ends
+    inference_pool.acquire()
+    try:
+        temp_file_path = await save_upload(audio_file)
+    except Exception:
+        inference_pool.release()
+        raise
+    
+    async def events():
+        loop = asyncio.get_running_loop()
+        windows = iter_audio_windows(temp_file_path, STREAM_WINDOW_SECONDS)
+        texts = []
+        offset = 0.0
+        total_skipped = 0.0
+        try:
+            segment = 0
+            while True:
+                # Decoding blocks on ffmpeg, so pull each window off the event loop
+                window = await loop.run_in_executor(None, next, windows, None)
+                if window is None:
+                    break
+                duration = len(window) / SAMPLE_RATE
+                speech, skipped = remove_silence(window)
+                total_skipped += skipped
+                text, queue_wait, inference = "", 0.0, 0.0
+                if len(speech):
+                    # Carry the end of the previous text over, so words cut at a window edge keep their context
+                    prompt = " ".join(texts)[-200:] or None
+                    text, queue_wait, inference = await inference_pool.run(
+                        lambda audio: transcribe_samples(audio, initial_prompt=prompt), speech
+                    )
+                print(f"Window {segment} ({duration:.1f}s of audio, {skipped:.1f}s silent) transcribed in {inference:.2f}s (queue wait {queue_wait:.2f}s)")
+                if text:
+                    texts.append(text)
+                yield sse_event({
+                    "segment": segment,
+                    "start": round(offset, 2),
+                    "end": round(offset + duration, 2),
+                    "text": text,
+                    "queue_wait_ms": round(queue_wait * 1000),
+                    "inference_ms": round(inference * 1000),
+                    "skipped_seconds": round(skipped, 2),
+                })
+                offset += duration
+                segment += 1
+            yield sse_event({"transcription": " ".join(texts), "skipped_seconds": round(total_skipped, 2)}, event="done")
+        except Exception as e:
+            print(f"Error during streaming transcription: {str(e)}")
+            yield sse_event({"detail": f"Error processing audio: {str(e)}"}, event="error")
+        finally:
+            inference_pool.release()
+            windows.close()
+            if os.path.exists(temp_file_path):
+                os.unlink(temp_file_path)
+                print(f"Cleaned up temporary file: {temp_file_path}")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def read_batch_files(audio_files: List[UploadFile]) -> List[Tuple[str, bytes]]:
+    """Read the uploads of a batch request, expanding zip archives into their audio files."""
+    files = []
+    for upload in audio_files:
+        data = await upload.read()
+        name = upload.filename or f"file-{len(files)}"
+        if is_zip(name, upload.content_type, data):
+            try:
+                files.extend(expand_zip(data, BATCH_MAX_FILES - len(files)))
+            except (zipfile.BadZipFile, ValueError) as e:
+                raise HTTPException(status_code=400, detail=f"Invalid archive {name}: {str(e)}")
+        elif (upload.content_type or "").startswith("audio/") or os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+            files.append((name, data))
+        else:
+            raise HTTPException(status_code=400, detail=f"File must be an audio file or a zip archive: {name}")
+        if len(files) > BATCH_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"A batch can contain at most {BATCH_MAX_FILES} files")
+    if not files:
+        raise HTTPException(status_code=400, detail="No audio files in the request")
+    return files
+
+async def run_batch_job(job: BatchJob, files: List[Tuple[str, bytes]]):
+    """
+    Decode every file of a batch job in parallel, then transcribe them on the inference pool.
+    Clips that fit in one Whisper window are decoded WHISPER_BATCH_SIZE at a time in a single
+    batched pass; longer ones go through the regular transcribe loop.
+    """
+    loop = asyncio.get_running_loop()
+    decode_slots = asyncio.Semaphore(BATCH_DECODE_WORKERS)
+    job.status = "running"
+    start_time = time.time()
+    
+    keys = [None] * len(files)
+    
+    async def decode(index: int, name: str, data: bytes):
+        result = job.results[index]
+        if not TRANSCRIPT_CACHE_NORMALIZE:
+            keys[index] = transcript_cache_key(audio_fingerprint(data))
+            cached = transcript_cache.get(keys[index])
+            if cached is not None:
+                result.update(status="done", cached=True, **cached)
+                return None
+        async with decode_slots:
+            try:
+                suffix = os.path.splitext(name)[1] or ".wav"
+                audio = await loop.run_in_executor(None, decode_audio_bytes, data, suffix)
+            except Exception as e:
+                result.update(status="failed", error=f"Error decoding audio: {str(e)}")
+                return None
+        if keys[index] is None:
+            keys[index] = transcript_cache_key(pcm_fingerprint(audio))
+            cached = transcript_cache.get(keys[index])
+            if cached is not None:
+                result.update(status="done", cached=True, **cached)
+                return None
+        speech, skipped = remove_silence(audio)
+        result.update(status="decoded", audio_seconds=round(len(audio) / SAMPLE_RATE, 2), skipped_seconds=round(skipped, 2))
+        if not len(speech):
+            finish(index, "", 0.0)
+            return None
+        return speech
+    
+    def finish(index: int, text: str, inference: float):
+        result = job.results[index]
+        result.update(status="done", transcription=text, inference_ms=round(inference * 1000), cached=False)
+        transcript_cache.put(keys[index], {
+            "transcription": text,
+            "audio_seconds": result["audio_seconds"],
+            "skipped_seconds": result["skipped_seconds"],
+        })
+    
+    try:
+        clips = await asyncio.gather(*(decode(index, name, data) for index, (name, data) in enumerate(files)))
+        files.clear()
+        print(f"Batch {job.id}: decoded {len(clips)} files in {time.time() - start_time:.2f}s")
+        
+        short = [index for index, clip in enumerate(clips) if clip is not None and fits_window(clip)]
+        long = [index for index, clip in enumerate(clips) if clip is not None and not fits_window(clip)]
+        
+        for offset in range(0, len(short), WHISPER_BATCH_SIZE):
+            group = short[offset:offset + WHISPER_BATCH_SIZE]
+            try:
+                texts, queue_wait, inference = await inference_pool.run(
+                    lambda batch: transcribe_window_batch(get_whisper_model(), batch), [clips[index] for index in group]
+                )
+            except Exception as e:
+                for index in group:
+                    job.results[index].update(status="failed", error=f"Error transcribing audio: {str(e)}")
+                continue
+            print(f"Batch {job.id}: transcribed {len(group)} clips in one pass in {inference:.2f}s")
+            for index, text in zip(group, texts):
+                finish(index, text, inference / len(group))
+                clips[index] = None
+        
+        for index in long:
+            try:
+                text, queue_wait, inference = await inference_pool.run(transcribe_samples, clips[index])
+            except Exception as e:
+                job.results[index].update(status="failed", error=f"Error transcribing audio: {str(e)}")
+                continue
+            finish(index, text, inference)
+            clips[index] = None
+        
+        job.status = "done"
+    except Exception as e:
+        print(f"Error in batch {job.id}: {str(e)}")
+        job.status = "failed"
+        job.error = str(e)
+        for result in job.results:
+            if result["status"] not in ("done", "failed"):
+                result.update(status="failed", error=job.error)
+    finally:
+        job.finished = time.time()
+        inference_pool.release()
+        print(f"Batch {job.id} {job.status}: {len(job.results)} files in {job.finished - start_time:.2f}s")
+
+@app.post("/transcribe/batch", status_code=202, tags=["Transcription"], summary="Transcribe many audio files")
+async def transcribe_batch(audio_files: List[UploadFile] = File(...)):
+    """
+    Start transcribing many audio files, or zip archives of them, as a background job.
+    
+    - **audio_files**: Audio files and/or zip archives (repeat the field for each file)
+    
+    Returns:
+    - **job_id**: Poll `GET /transcribe/batch/{job_id}` for progress and results
+    - **status**: `queued`
+    - **total**: Number of audio files in the job
+    
+    The job holds one transcription slot until it finishes, so it responds with 503 and a
+    Retry-After header when the transcription queue is full.
+    """
+    files = await read_batch_files(audio_files)
+    print(f"Received batch of {len(files)} audio files")
+    inference_pool.acquire()
+    job = batch_jobs.create([name for name, _ in files])
+    job.task = asyncio.create_task(run_batch_job(job, files))
+    return {"job_id": job.id, "status": job.status, "total": len(files)}
+
+@app.get("/transcribe/batch/{job_id}", tags=["Transcription"], summary="Get a batch transcription job")
+async def get_batch_job(job_id: str):
+    """
+    Get the progress and results of a batch transcription job.
+    
+    - **job_id**: The ID returned when the job was created
+    
+    Returns:
+    - **status**: `queued`, `running`, `done` or `failed`
+    - **total** / **completed**: Files in the job and files finished so far
+    - **results**: One entry per file with its `filename`, `status` and, once done, `transcription`,
+      `audio_seconds` and `skipped_seconds` (or `error`)
+    """
+    job = batch_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job.to_dict()
 
 if __name__ == "__main__":
     import uvicorn
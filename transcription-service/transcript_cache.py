@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+import numpy as np
+
+
+def audio_fingerprint(data: bytes) -> str:
+    """Fingerprint of an uploaded file, byte for byte."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def pcm_fingerprint(audio: np.ndarray) -> str:
+    """
+    Fingerprint of decoded audio, quantized to 16-bit PCM.
+    Matches the same recording uploaded in a different container or with different metadata.
+    """
+    pcm = np.clip(audio * 32768.0, -32768, 32767).astype(np.int16)
+    return hashlib.sha256(pcm.tobytes()).hexdigest()
+
+
+def cache_key(fingerprint: str, model_name: str, language: Optional[str], options: str = "") -> str:
+    """Key for a transcript: the audio fingerprint, the model that produced it, the language and decoding options."""
+    digest = hashlib.sha256()
+    for part in (fingerprint, model_name, language or "auto", options):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    Persistent LRU cache of finished transcripts, keyed by `cache_key`.
+
+    Serves retried uploads and audio that is transcribed again: results are stored as
+    the JSON the endpoint returns, in a SQLite file shared by the request and batch
+    threads. Each hit refreshes the entry's last use, and once there are more than
+    `max_entries` the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str = "transcript_cache.db", max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_transcripts_last_used ON transcripts(last_used);
+            """)
+
+    def get(self, key: str) -> Optional[Dict[str, object]]:
+        """The cached result for the key, or None."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT result FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE transcripts SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, result: Dict[str, object]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcripts (key, result, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(result), time.time()),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM transcripts WHERE key IN (SELECT key FROM transcripts ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()
+            return {"entries": entries, "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
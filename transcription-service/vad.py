@@ -0,0 +1,88 @@
+from typing import List, Tuple
+import numpy as np
+from audio import SAMPLE_RATE
+
+# Analysis frame length for the energy detector
+FRAME_SECONDS = 0.03
+
+
+def frame_energy_db(audio: np.ndarray, frame_length: int) -> np.ndarray:
+    """RMS energy of consecutive non-overlapping frames, in dB relative to full scale."""
+    frames = len(audio) // frame_length
+    if frames == 0:
+        return np.zeros(0, np.float32)
+    blocks = audio[:frames * frame_length].reshape(frames, frame_length)
+    rms = np.sqrt(np.mean(np.square(blocks, dtype=np.float32), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def detect_speech(audio: np.ndarray,
+                  threshold_db: float = -45.0,
+                  margin_db: float = 12.0,
+                  min_speech_seconds: float = 0.25,
+                  min_silence_seconds: float = 0.6,
+                  padding_seconds: float = 0.2) -> List[Tuple[int, int]]:
+    """
+    Find the regions of a 16 kHz waveform that contain speech, as (start, end) sample ranges.
+
+    A frame counts as speech when its energy is above both `threshold_db` and the
+    estimated noise floor plus `margin_db`, so quiet rooms and noisy phone lines are
+    both handled. Pauses shorter than `min_silence_seconds` stay inside a region, bursts
+    shorter than `min_speech_seconds` are dropped, and each region is padded so word
+    onsets and endings are not clipped.
+    """
+    frame_length = int(FRAME_SECONDS * SAMPLE_RATE)
+    energy = frame_energy_db(audio, frame_length)
+    if len(energy) == 0:
+        return []
+
+    noise_floor = np.percentile(energy, 10)
+    # The margin over the noise floor is capped below the loud parts, or continuous speech
+    # (where the "floor" is speech too) would be cut; the absolute threshold always applies
+    threshold = max(threshold_db, min(noise_floor + margin_db, np.percentile(energy, 90) - 3))
+    speech = energy > threshold
+
+    # Runs of speech frames as [start, end) frame indexes
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype(np.int8), [0]))))
+    runs = list(zip(edges[::2], edges[1::2]))
+
+    min_silence = int(min_silence_seconds / FRAME_SECONDS)
+    merged: List[List[int]] = []
+    for start, end in runs:
+        if merged and start - merged[-1][1] < min_silence:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    min_speech = int(min_speech_seconds / FRAME_SECONDS)
+    padding = int(padding_seconds * SAMPLE_RATE)
+    regions: List[Tuple[int, int]] = []
+    for start, end in merged:
+        if end - start < min_speech:
+            continue
+        start = max(0, int(start) * frame_length - padding)
+        end = min(len(audio), int(end) * frame_length + padding)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+
+def keep_speech(audio: np.ndarray, regions: List[Tuple[int, int]], gap_seconds: float = 0.3) -> np.ndarray:
+    """
+    Join the speech regions into one waveform, separated by short silences.
+
+    Whisper pads every call to a full 30 s window, so transcribing the joined speech in
+    one go costs time in proportion to the speech, whereas one call per region would
+    pay for a whole window each time. The gaps keep sentence boundaries audible.
+    """
+    if not regions:
+        return np.zeros(0, np.float32)
+    gap = np.zeros(int(gap_seconds * SAMPLE_RATE), np.float32)
+    parts = []
+    for start, end in regions:
+        if parts:
+            parts.append(gap)
+        parts.append(audio[start:end])
+    return np.concatenate(parts)
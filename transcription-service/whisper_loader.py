@@ -0,0 +1,37 @@
+import time
+import torch
+import whisper
+from whisper.model import Linear as WhisperLinear
+
+# Model tiers in order of size; any other value is passed to whisper.load_model as is (e.g. a checkpoint path)
+MODEL_TIERS = ["tiny", "base", "small", "medium", "large"]
+
+
+def quantize_int8(model: whisper.model.Whisper) -> whisper.model.Whisper:
+    """
+    Dynamically quantize the linear layers of a CPU model to int8.
+
+    Weights are stored as int8 and activations are quantized on the fly, which roughly
+    quarters the memory of the attention and MLP weights and speeds up CPU inference at
+    a small cost in accuracy.
+    """
+    # Whisper's Linear subclass only adds dtype casting for fp16, which does not apply on
+    # the CPU; turn it back into a plain nn.Linear so quantize_dynamic recognises it
+    for module in model.modules():
+        if type(module) is WhisperLinear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_whisper_model(name: str = "base", device: str = None, quantize: bool = False) -> whisper.model.Whisper:
+    """Load a Whisper model, optionally quantized to int8 when it runs on the CPU."""
+    start_time = time.time()
+    model = whisper.load_model(name, device=device)
+    if quantize:
+        if model.device.type == "cpu":
+            model = quantize_int8(model)
+        else:
+            print(f"Skipping int8 quantization, it is only supported on the CPU (model is on {model.device})")
+            quantize = False
+    print(f"Whisper model '{name}'{' (int8)' if quantize else ''} loaded on {model.device} in {time.time() - start_time:.2f}s")
+    return model